@@ -0,0 +1,1124 @@
+# Copyright 2019 ashafer01
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Microbenchmarks for void.py
+
+Every benchmark times one statement against a set of subjects (Void, None,
+a plain object() and a hand-written no-op class by default) and reports the
+best time per operation in nanoseconds. Subjects that do not support the
+statement at all are recorded as null rather than timed.
+
+    python bench.py                     run everything, print a table
+    python bench.py dunder async        run only the named groups
+    python bench.py --save              also write bench_results/<python>.json
+    python bench.py --compare FILE      flag regressions against a saved run
+
+Size and allocation benchmarks report bytes instead of a time, and threaded
+ones the wall-clock time per operation over all their threads.
+"""
+
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import threading
+import timeit
+import tracemalloc
+
+import void
+from void import (AbsorbingVoid, InstrumentedVoid, Void, VoidInstrumentation,
+                  VoidType, elide_void)
+
+
+class NoOp(object):
+    """Hand-written no-op with the cheapest possible body for each protocol"""
+
+    __slots__ = ()
+
+    def __getattr__(self, attr):
+        pass
+
+    def __call__(self, *args, **kwds):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, etype, e, trace):
+        return True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, etype, e, trace):
+        return True
+
+    def __eq__(self, other):
+        return False
+
+    def __le__(self, other):
+        return False
+
+    def __ge__(self, other):
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        raise StopIteration
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+    def __await__(self):
+        return iter(())
+
+    async def asend(self, value):
+        pass
+
+    async def athrow(self, type, value=None, traceback=None):
+        pass
+
+    async def aclose(self):
+        pass
+
+    def __add__(self, other):
+        pass
+
+    def __radd__(self, other):
+        pass
+
+    def __iadd__(self, other):
+        return self
+
+    def __getitem__(self, key):
+        pass
+
+    def __setitem__(self, key, value):
+        pass
+
+    def __hash__(self):
+        return 0
+
+    def __bool__(self):
+        return False
+
+
+SUBJECTS = collections.OrderedDict([
+    ('Void', Void),
+    ('None', None),
+    ('object', object()),
+    ('NoOp', NoOp()),
+])
+
+
+def drive(awaitable):
+    """Run an awaitable that never actually suspends, without an event loop"""
+    try:
+        awaitable.send(None)
+    except (StopIteration, StopAsyncIteration):
+        pass
+
+
+# each async benchmark runs LOOPS operations inside one coroutine, so the
+# cost of creating the driving coroutine is spread thin
+
+LOOPS = 100
+
+
+async def await_it(x):
+    for _ in range(LOOPS):
+        await x
+
+
+async def async_with(x):
+    for _ in range(LOOPS):
+        async with x:
+            pass
+
+
+async def async_with_touch(x):
+    for _ in range(LOOPS):
+        async with x as c:
+            c.attr
+
+
+async def async_for(x):
+    for _ in range(LOOPS):
+        async for _ in x:
+            pass
+
+
+async def anext_it(x):
+    for _ in range(LOOPS):
+        try:
+            await x.__anext__()
+        except StopAsyncIteration:
+            pass
+
+
+async def asend_it(x):
+    for _ in range(LOOPS):
+        await x.asend(None)
+
+
+async def athrow_it(x):
+    for _ in range(LOOPS):
+        await x.athrow(ValueError)
+
+
+async def aclose_it(x):
+    for _ in range(LOOPS):
+        await x.aclose()
+
+
+Benchmark = collections.namedtuple('Benchmark', 'group name cases ops unit')
+
+BENCHMARKS = []
+FIXTURES = []
+
+
+class fixture(object):
+    """Decorator making a generator function the setup of a namespace
+
+    Passed as the `namespace` of any bench_*() function, the generator runs
+    up to its yield only once a benchmark using it is run, and the dict it
+    yields is shared by all of them; run() resumes it to tear down once the
+    group is done, so nothing is built for groups that are not run.
+    """
+
+    def __init__(self, setup):
+        self.setup = setup
+        self.running = None
+        self.ns = None
+        FIXTURES.append(self)
+
+    def __call__(self):
+        if self.running is None:
+            self.running = self.setup()
+            self.ns = next(self.running)
+        return self.ns
+
+    def close(self):
+        running, self.running, self.ns = self.running, None, None
+        if running is not None:
+            for _ in running:
+                pass
+
+
+def scope(namespace=None, **extra):
+    """A function building the namespace one case of a benchmark runs in
+
+    That is the module namespace, plus `namespace` (a dict or a fixture),
+    plus `extra`.
+    """
+    def build():
+        ns = dict(globals())
+        if namespace:
+            ns.update(namespace() if callable(namespace) else namespace)
+        ns.update(extra)
+        return ns
+    return build
+
+
+def bench_cases(group, name, cases, namespace=None, ops=1):
+    """Register a benchmark from a mapping of label -> statement
+
+    All statements share the module namespace plus anything in `namespace`.
+    `ops` is how many operations one run of a statement performs.
+    """
+    ns = scope(namespace)
+    BENCHMARKS.append(Benchmark(group, name, collections.OrderedDict(
+        (label, (stmt, ns)) for label, stmt in cases.items()), ops, 'ns'))
+
+
+def bench_sizes(group, name, cases, namespace=None):
+    """Register a size measurement from a mapping of label -> expression
+
+    Each expression is evaluated once and the len() of its result reported
+    in bytes, in place of a time.
+    """
+    ns = scope(namespace)
+    BENCHMARKS.append(Benchmark(group, name, collections.OrderedDict(
+        (label, (expr, ns)) for label, expr in cases.items()), 1, 'B'))
+
+
+def bench_allocations(group, name, cases, namespace=None):
+    """Register a peak memory measurement from a mapping of label -> stmt
+
+    Each statement runs in a loop under tracemalloc, and the peak above the
+    same loop around `pass` is reported in bytes; an operation that
+    allocates nothing per call stays at 0 however often it runs.
+    """
+    ns = scope(namespace)
+    BENCHMARKS.append(Benchmark(group, name, collections.OrderedDict(
+        (label, (stmt, ns)) for label, stmt in cases.items()), 1, 'B peak'))
+
+
+def bench_threads(group, name, cases, threads=(1, 8, 32), namespace=None):
+    """Register a benchmark running each statement from several threads
+
+    Every label is run once per thread count, reported as label/count, with
+    all threads sharing one namespace. The result is wall-clock time per
+    operation over all threads together, so a statement that scales falls
+    in proportion to the thread count, and one that contends stays flat.
+    """
+    BENCHMARKS.append(Benchmark(group, name, collections.OrderedDict(
+        ('{0}/{1}'.format(label, count),
+         (stmt, scope(namespace, THREADS=count)))
+        for label, stmt in cases.items() for count in threads), 1, 'ns wall'))
+
+
+def bench_imports(group, name, modules):
+    """Register an import time measurement for each module, real and void
+
+    Every module is imported in a fresh interpreter under -X importtime
+    after void, once as it is and once disabled through VOID_MODULES, as
+    label/void; reported is the cumulative time of both imports in
+    microseconds.
+    """
+    cases = collections.OrderedDict()
+    for module in modules:
+        cases[module] = (module, dict)
+        cases[module + '/void'] = (
+            module, functools.partial(dict, VOID_MODULES=module))
+    BENCHMARKS.append(Benchmark(group, name, cases, 1, 'us import'))
+
+
+def bench(group, name, stmt, subjects=SUBJECTS, namespace=None, ops=1):
+    """Register a benchmark running `stmt` once per subject, bound to `x`"""
+    cases = collections.OrderedDict()
+    for label, subject in subjects.items():
+        cases[label] = (stmt, scope(namespace, x=subject))
+    BENCHMARKS.append(Benchmark(group, name, cases, ops, 'ns'))
+
+
+# one benchmark per VoidType protocol
+
+bench('dunder', 'getattr', 'x.attr')
+bench('dunder', 'call', 'x()')
+bench('dunder', 'call_args', 'x(1, 2, key=3)')
+bench('dunder', 'with', 'with x: pass')
+bench('dunder', 'with_touch', 'with x as c:\n    c.attr')
+bench('dunder', 'eq', 'x == 1')
+bench('dunder', 'ne', 'x != 1')
+bench('dunder', 'le_number', 'x <= 1')
+bench('dunder', 'le_other', 'x <= "a"')
+bench('dunder', 'ge_number', 'x >= 1')
+bench('dunder', 'ge_other', 'x >= "a"')
+bench('dunder', 'hash', 'hash(x)')
+bench('dunder', 'bool', 'not x')
+bench('dunder', 'iter', 'for _ in x: pass')
+bench('dunder', 'next', 'next(x, None)')
+bench('dunder', 'getitem', 'x[0]')
+bench('dunder', 'setitem', 'x[0] = 1')
+bench('dunder', 'add', 'x + 1')
+bench('dunder', 'radd', '1 + x')
+bench('dunder', 'iadd', 'y = x\ny += 1')
+bench('dunder', 'str', 'str(x)')
+
+# NoOp implements each of these as a hand-written async def
+
+bench('async', 'await', 'drive(await_it(x))', ops=LOOPS)
+bench('async', 'async_with', 'drive(async_with(x))', ops=LOOPS)
+bench('async', 'async_with_touch', 'drive(async_with_touch(x))', ops=LOOPS)
+bench('async', 'async_for', 'drive(async_for(x))', ops=LOOPS)
+bench('async', 'anext', 'drive(anext_it(x))', ops=LOOPS)
+bench('async', 'asend', 'drive(asend_it(x))', ops=LOOPS)
+bench('async', 'athrow', 'drive(athrow_it(x))', ops=LOOPS)
+bench('async', 'aclose', 'drive(aclose_it(x))', ops=LOOPS)
+
+
+def query(db):
+    with db as cursor:
+        cursor.execute('SELECT 1')
+
+
+elided_query = elide_void(query)
+
+
+def guarded_query(db):
+    if db is not None:
+        with db as cursor:
+            cursor.execute('SELECT 1')
+
+
+bench_cases('elide', 'with_block', collections.OrderedDict([
+    ('exception', 'query(Void)'),
+    ('elided', 'elided_query(Void)'),
+    ('guard', 'guarded_query(None)'),
+    ('NoOp', 'query(noop)'),
+    ('NoOp_elided', 'elided_query(noop)'),
+]), namespace={'noop': NoOp()})
+
+
+class CountedVoidType(VoidType):
+    """Permanently instrumented, to time the enabled path"""
+
+    __slots__ = ()
+
+
+VoidInstrumentation(CountedVoidType).enable()
+
+INSTRUMENTED = collections.OrderedDict([
+    ('Void', Void),
+    ('off', InstrumentedVoid),
+    ('on', CountedVoidType()),
+])
+
+bench('instrument', 'getattr', 'x.attr', INSTRUMENTED)
+bench('instrument', 'call', 'x()', INSTRUMENTED)
+bench('instrument', 'eq', 'x == 1', INSTRUMENTED)
+bench('instrument', 'with', 'with x: pass', INSTRUMENTED)
+bench('instrument', 'with_touch', 'with x as c:\n    c.attr', INSTRUMENTED)
+
+
+# a 5-deep attribute/call chain, absorbed or guarded
+
+bench_cases('chain', 'depth5', collections.OrderedDict([
+    ('AbsorbingVoid', "x.client.bucket('x').put(1).meta.commit()"),
+    ('Void', "v.client.bucket('x').put(1).meta.commit()"),
+    ('guard', "if n is not None:\n"
+              "    n.client.bucket('x').put(1).meta.commit()"),
+]), namespace={'x': AbsorbingVoid, 'v': Void, 'n': None})
+
+
+# scheduling Void through asyncio, LOOPS times per run of the loop
+
+async def gather_voids(gather):
+    for _ in range(LOOPS):
+        await gather(Void, Void, Void, Void, Void, Void, Void, Void, Void, Void)
+
+
+async def wait_for_void(wait_for):
+    for _ in range(LOOPS):
+        await wait_for(Void, 1)
+
+
+async def ensure_void(ensure_future):
+    for _ in range(LOOPS):
+        await ensure_future(Void)
+
+
+@fixture
+def scheduling():
+    loop = asyncio.new_event_loop()
+    try:
+        yield {'loop': loop, 'void': void}
+    finally:
+        loop.close()
+
+
+bench_cases('asyncio', 'gather10', collections.OrderedDict([
+    ('void', 'loop.run_until_complete(gather_voids(void.gather))'),
+    ('asyncio', 'loop.run_until_complete(gather_voids(asyncio.gather))'),
+]), namespace=scheduling, ops=LOOPS)
+bench_cases('asyncio', 'wait_for', collections.OrderedDict([
+    ('void', 'loop.run_until_complete(wait_for_void(void.wait_for))'),
+    ('asyncio', 'loop.run_until_complete(wait_for_void(asyncio.wait_for))'),
+]), namespace=scheduling, ops=LOOPS)
+bench_cases('asyncio', 'ensure_future', collections.OrderedDict([
+    ('void', 'loop.run_until_complete(ensure_void(void.ensure_future))'),
+    ('asyncio',
+     'loop.run_until_complete(ensure_void(asyncio.ensure_future))'),
+]), namespace=scheduling, ops=LOOPS)
+
+
+# background work through a null executor or pool, or a real one
+
+def noop(*args):
+    pass
+
+
+@fixture
+def executors():
+    with concurrent.futures.ThreadPoolExecutor(1) as thread_executor:
+        yield {'void_executor': void.VoidExecutor(),
+               'void_pool': void.VoidPool(),
+               'thread_executor': thread_executor}
+
+
+bench_cases('executor', 'submit_result', collections.OrderedDict([
+    ('VoidExecutor', 'void_executor.submit(noop).result()'),
+    ('VoidPool', 'void_pool.apply_async(noop).get()'),
+    ('ThreadPoolExecutor', 'thread_executor.submit(noop).result()'),
+]), namespace=executors)
+bench_cases('executor', 'map100', collections.OrderedDict([
+    ('VoidExecutor', 'for _ in void_executor.map(noop, range(100)): pass'),
+    ('ThreadPoolExecutor',
+     'for _ in thread_executor.map(noop, range(100)): pass'),
+]), namespace=executors, ops=100)
+
+
+# serializing records into a stream whose sink is a VoidStreamWriter, or a
+# real pipe transport writing to os.devnull
+
+RECORD = json.dumps({'metric': 'requests', 'value': 1.0}).encode()
+
+
+async def write_records(writer):
+    for _ in range(LOOPS):
+        writer.write(RECORD)
+        await writer.drain()
+
+
+async def devnull_writer():
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.connect_write_pipe(
+        asyncio.streams.FlowControlMixin, open(os.devnull, 'wb'))
+    return asyncio.StreamWriter(transport, protocol, None, loop)
+
+
+@fixture
+def streams():
+    loop = asyncio.new_event_loop()
+    ns = {'loop': loop, 'void_writer': void.VoidStreamWriter()}
+    try:
+        if sys.platform != 'win32':
+            ns['devnull_writer'] = loop.run_until_complete(devnull_writer())
+        yield ns
+    finally:
+        if 'devnull_writer' in ns:
+            ns['devnull_writer'].close()
+            loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
+
+
+bench_cases('streams', 'write_drain', collections.OrderedDict([
+    ('VoidStreamWriter',
+     'loop.run_until_complete(write_records(void_writer))'),
+    ('devnull', 'loop.run_until_complete(write_records(devnull_writer))'),
+]), namespace=streams, ops=LOOPS)
+
+
+# streaming writes into a VoidIO, or into the null device
+
+@fixture
+def files():
+    with open(os.devnull, 'wb', buffering=0) as devnull_raw, \
+            open(os.devnull, 'wb') as devnull_buffered:
+        yield {'chunk': b'x' * (1 << 20),
+               'line': b'x' * 100 + b'\n',
+               'void_raw': void.VoidIO(),
+               'void_buffered': io.BufferedWriter(void.VoidIO()),
+               'devnull_raw': devnull_raw,
+               'devnull_buffered': devnull_buffered}
+
+
+bench_cases('io', 'write_1mib', collections.OrderedDict([
+    ('VoidIO', 'void_raw.write(chunk)'),
+    ('devnull', 'devnull_raw.write(chunk)'),
+]), namespace=files)
+bench_cases('io', 'buffered_line', collections.OrderedDict([
+    ('VoidIO', 'void_buffered.write(line)'),
+    ('devnull', 'devnull_buffered.write(line)'),
+]), namespace=files)
+
+
+# a function calling a dozen methods on its backend, as written and
+# specialized for an AbsorbingVoid backend
+
+def report(x, backend):
+    backend.begin(x)
+    backend.set('a', x)
+    backend.set('b', x)
+    backend.incr('count')
+    backend.tags.add(x)
+    backend.tags.add('static')
+    backend.timing('elapsed', x)
+    backend.gauge('size', x)
+    backend.event('report', x)
+    backend.flush()
+    backend.client.send(x)
+    backend.end(x)
+    return x
+
+
+@fixture
+def specialized():
+    yield {'specialized': void.specialize_void(report)}
+
+
+bench_cases('specialize', 'dozen_calls', collections.OrderedDict([
+    ('specialized', 'specialized(1, AbsorbingVoid)'),
+    ('original', 'report(1, AbsorbingVoid)'),
+]), namespace=specialized)
+
+
+# a logging call on a logger with only a NullHandler, or on a VoidLogger
+
+def null_handler_logger(name):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+    return logger
+
+
+@fixture
+def loggers():
+    yield {'obj': object(),
+           'null_handler': null_handler_logger('bench.null_handler'),
+           'void_logger': void.void_logger(null_handler_logger('bench.void'))}
+
+
+bench_cases('logging', 'info', collections.OrderedDict([
+    ('VoidLogger', 'void_logger.info("x=%s", obj)'),
+    ('NullHandler', 'null_handler.info("x=%s", obj)'),
+]), namespace=loggers)
+
+
+# task payloads with 100k Void placeholders, pickled as for a process pool
+
+FIELDS = 100000
+
+
+@fixture
+def payloads():
+    void_payload = [{'id': i, 'backend': Void} for i in range(FIELDS)]
+    none_payload = [{'id': i, 'backend': None} for i in range(FIELDS)]
+    yield {'pickle': pickle,
+           'void_payload': void_payload,
+           'none_payload': none_payload,
+           'void_pickled': pickle.dumps(void_payload),
+           'none_pickled': pickle.dumps(none_payload)}
+
+
+bench_sizes('pickle', 'payload_bytes', collections.OrderedDict([
+    ('Void', 'void_pickled'),
+    ('None', 'none_pickled'),
+]), namespace=payloads)
+bench_cases('pickle', 'dumps', collections.OrderedDict([
+    ('Void', 'pickle.dumps(void_payload)'),
+    ('None', 'pickle.dumps(none_payload)'),
+]), namespace=payloads, ops=FIELDS)
+bench_cases('pickle', 'loads', collections.OrderedDict([
+    ('Void', 'pickle.loads(void_pickled)'),
+    ('None', 'pickle.loads(none_pickled)'),
+]), namespace=payloads, ops=FIELDS)
+
+
+# ufuncs and conversions mixing Void with a 10M element array, if numpy is
+# installed
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if numpy is not None:
+    @fixture
+    def arrays():
+        yield {'np': numpy, 'array': numpy.arange(10 ** 7, dtype=float)}
+
+    bench_cases('numpy', 'add_10m', collections.OrderedDict([
+        ('Void', 'array + Void'),
+        ('zero', 'array + 0'),
+    ]), namespace=arrays)
+    bench_cases('numpy', 'ufunc_10m', collections.OrderedDict([
+        ('Void', 'np.multiply(array, Void)'),
+        ('zero', 'np.multiply(array, 0)'),
+    ]), namespace=arrays)
+    bench_cases('numpy', 'sum_10m', collections.OrderedDict([
+        ('Void', 'np.sum(Void)'),
+        ('array', 'np.sum(array)'),
+    ]), namespace=arrays)
+    bench_cases('numpy', 'asarray', collections.OrderedDict([
+        ('Void', 'np.asarray(Void)'),
+        ('list', 'np.asarray([])'),
+    ]), namespace=arrays)
+
+
+# zero-copy consumers given Void (Python 3.12+ only), its as_buffer()
+# fallback, or an empty bytes object
+
+BUFFERS = {'hashlib': hashlib, 'digest': hashlib.sha256(), 'empty': b'',
+           'as_buffer': void.as_buffer}
+BUFFER_CASES = collections.OrderedDict([
+    ('Void', '{0}(Void)'),
+    ('as_buffer', '{0}(as_buffer(Void))'),
+    ('bytes', '{0}(empty)'),
+])
+
+for name, call in [('memoryview', 'memoryview'),
+                   ('hash_update', 'digest.update')]:
+    bench_cases('buffer', name, collections.OrderedDict(
+        (label, stmt.format(call)) for label, stmt in BUFFER_CASES.items()),
+        namespace=BUFFERS)
+bench_allocations('buffer', 'hash_update_alloc', collections.OrderedDict(
+    (label, stmt.format('digest.update'))
+    for label, stmt in BUFFER_CASES.items()), namespace=BUFFERS)
+
+
+# recording calls while a backend is missing, then replaying them in bulk,
+# against making the same calls on the backend directly
+
+class Sink(object):
+    def put(self, key, value):
+        pass
+
+
+REPLAYED = 10000
+
+
+def record_and_replay(recorder, sink):
+    backend = recorder.void
+    for i in range(REPLAYED):
+        backend.put(i, i)
+    recorder.replay(sink)
+
+
+def call_directly(sink):
+    for i in range(REPLAYED):
+        sink.put(i, i)
+
+
+@fixture
+def recording():
+    yield {'recorder': void.Recorder(REPLAYED),
+           'recent': void.Recorder(1000),
+           'sink': Sink()}
+
+
+bench_cases('record', 'record_call', collections.OrderedDict([
+    ('Recorder', 'recent.void.put(1, 2)'),
+    ('Void', 'Void(1, 2)'),
+]), namespace=recording)
+bench_cases('record', 'replay_10k', collections.OrderedDict([
+    ('record_and_replay', 'record_and_replay(recorder, sink)'),
+    ('direct', 'call_directly(sink)'),
+]), namespace=recording, ops=REPLAYED)
+
+
+# the per-call cost of going through a CircuitBreaker, closed and open,
+# against calling the backend directly
+
+def tripped(backend):
+    breaker = void.CircuitBreaker(backend, cooldown=float('inf'))
+    breaker.proxy.put(1, 2)
+    breaker.trip()
+    return breaker.proxy
+
+
+@fixture
+def breakers():
+    yield {'sink': Sink(),
+           'closed': void.CircuitBreaker(Sink()).proxy,
+           'closed_void': void.CircuitBreaker(Void).proxy,
+           'tripped': tripped(Sink())}
+
+
+bench_cases('breaker', 'guarded_call', collections.OrderedDict([
+    ('closed', 'closed.put(1, 2)'),
+    ('open', 'tripped.put(1, 2)'),
+    ('direct', 'sink.put(1, 2)'),
+]), namespace=breakers)
+bench_cases('breaker', 'guarded_with', collections.OrderedDict([
+    ('closed', 'with closed_void: pass'),
+    ('open', 'with tripped: pass'),
+]), namespace=breakers)
+
+
+# sampling calls on a backend, from several threads at once
+
+@fixture
+def sampling():
+    yield {'sink': Sink(),
+           'sampled': void.Sampler(Sink(), 0.1).proxy,
+           'limited': void.Sampler(Sink(), limit=1000).proxy}
+
+
+bench_threads('sample', 'sampled_call', collections.OrderedDict([
+    ('Sampler', 'sampled.put(1, 2)'),
+    ('limited', 'limited.put(1, 2)'),
+    ('direct', 'sink.put(1, 2)'),
+]), namespace=sampling)
+
+
+# resolving a backend by name where some are disabled for this context,
+# against reading a global and a bare context variable
+
+@fixture
+def backends():
+    db = Sink()
+    void.register_backend('bench_db', db)
+    void.register_backend('bench_off', Sink())
+    var = contextvars.ContextVar('bench_var')
+    token = var.set(db)
+    try:
+        with void.disabled('bench_off'):
+            yield {'get_backend': void.get_backend, 'db': db, 'var': var}
+    finally:
+        var.reset(token)
+
+
+bench_cases('registry', 'resolve', collections.OrderedDict([
+    ('enabled', "get_backend('bench_db')"),
+    ('disabled', "get_backend('bench_off')"),
+    ('global', 'db'),
+    ('ContextVar', 'var.get()'),
+]), namespace=backends)
+
+
+# with blocks that run, against the standard library's null context and
+# an uncontended lock
+
+PASSING = collections.OrderedDict([
+    ('PassThroughVoid', void.PassThroughVoid),
+    ('nullcontext', contextlib.nullcontext()),
+    ('Lock', threading.Lock()),
+])
+bench('passthrough', 'with', 'with x:\n    pass', subjects=PASSING)
+bench('passthrough', 'async_with', 'drive(async_with(x))',
+      subjects=collections.OrderedDict([
+          ('PassThroughVoid', void.PassThroughVoid),
+          ('nullcontext', contextlib.nullcontext()),
+          ('Lock', asyncio.Lock()),
+      ]), ops=LOOPS)
+
+
+# comparing with operands whose truth is expensive, as by default and in
+# strict mode, where only the type of the operand is looked at
+
+class LazyLen(object):
+    """A lazily evaluated container, paying for its length on every call"""
+
+    def __len__(self):
+        return sum(range(100)) and 0
+
+
+def compare_void(x):
+    for _ in range(LOOPS):
+        Void == x
+        Void <= x
+
+
+def compare_strict(x):
+    void.strict_comparisons()
+    try:
+        compare_void(x)
+    finally:
+        void.strict_comparisons(False)
+
+
+OPERANDS = collections.OrderedDict([
+    ('int', 0), ('str', 'x'), ('list', []), ('LazyLen', LazyLen()),
+    ('object', object()),
+])
+bench('compare', 'eq_le', 'compare_void(x)', subjects=OPERANDS,
+      ops=LOOPS * 2)
+bench('compare', 'eq_le_strict', 'compare_strict(x)', subjects=OPERANDS,
+      ops=LOOPS * 2)
+
+
+# the shared singletons from many threads at once; on free-threaded builds
+# these should scale with the thread count
+
+bench_threads('threads', 'shared_void', collections.OrderedDict([
+    ('with', 'with Void:\n    pass'),
+    ('with_touch', 'with Void as v:\n    v.touch()'),
+    ('attr', 'Void.attr'),
+    ('absorbing_call', 'AbsorbingVoid.attr()'),
+    ('eq', 'Void == 0'),
+]), threads=(1, 2, 4, 8, 16, 32, 64))
+
+
+# startup time saved by disabling heavy imports, as -X importtime sees it
+
+bench_imports('imports', 'import_time', [
+    'asyncio', 'email.mime.multipart', 'http.client', 'xml.dom.minidom'])
+
+
+def supported(stmt, ns):
+    try:
+        exec(stmt, dict(ns))
+    except Exception:
+        return False
+    return True
+
+
+def time_case(stmt, ns, number, repeat, ops=1):
+    """Best time per operation in nanoseconds, or None if unsupported"""
+    if not supported(stmt, ns):
+        return None
+    number = max(1, number // ops)
+    timer = timeit.Timer(stmt, globals=ns)
+    return min(timer.repeat(repeat, number)) / (number * ops) * 1e9
+
+
+def peak_allocation(stmt, ns, number):
+    """Peak bytes allocated running stmt in a loop, beyond an empty loop"""
+    if not supported(stmt, ns):
+        return None
+    number = min(number, 10000)
+
+    def peak(stmt):
+        loop = compile('for _ in range({0}):\n    {1}'.format(
+            number, stmt.replace('\n', '\n    ')), '<bench>', 'exec')
+        scope = dict(ns)
+        exec(loop, scope)
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            # start() begins a new peak already, but only if it was not on;
+            # reset_peak() is missing before 3.9
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            exec(loop, scope)
+            return tracemalloc.get_traced_memory()[1] - before
+        finally:
+            tracemalloc.stop()
+
+    return max(0, peak(stmt) - peak('pass'))
+
+
+def threaded_time(stmt, ns, number, repeat):
+    """Best wall-clock time per operation with ns['THREADS'] threads"""
+    if not supported(stmt, ns):
+        return None
+    count = ns['THREADS']
+    number = max(1, number // count)
+    scope = dict(ns)
+    exec(compile('def loop():\n    for _ in range({0}):\n        {1}'.format(
+        number, stmt.replace('\n', '\n        ')), '<bench>', 'exec'), scope)
+    loop = scope['loop']
+    best = None
+    for _ in range(repeat):
+        ready = threading.Barrier(count + 1)
+
+        def work():
+            ready.wait()
+            loop()
+
+        workers = [threading.Thread(target=work) for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        ready.wait()
+        start = timeit.default_timer()
+        for worker in workers:
+            worker.join()
+        elapsed = timeit.default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / (number * count) * 1e9
+
+
+def import_time(module, env, repeat):
+    """Best cumulative -X importtime of void plus module, in microseconds"""
+    command = [sys.executable, '-X', 'importtime', '-c',
+               'import void; import {0}'.format(module)]
+    env = dict(os.environ, **env)
+    # time loading cached bytecode, as a deployed worker would
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    best = None
+    for _ in range(repeat):
+        process = subprocess.run(
+            command, env=env, check=True,
+            stderr=subprocess.PIPE, universal_newlines=True,
+            cwd=os.path.dirname(os.path.abspath(void.__file__)))
+        total = 0
+        for line in process.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() in ('void', module):
+                total += int(fields[1])
+        best = total if best is None else min(best, total)
+    return best
+
+
+def close_fixtures():
+    for f in FIXTURES:
+        f.close()
+
+
+def run(groups=None, number=100000, repeat=5, out=sys.stdout):
+    results = collections.OrderedDict()
+    group = None
+    try:
+        for b in BENCHMARKS:
+            if groups and b.group not in groups:
+                continue
+            if b.group != group:
+                close_fixtures()
+                group = b.group
+            key = '{0}.{1}'.format(b.group, b.name)
+            row = collections.OrderedDict()
+            for label, (stmt, build) in b.cases.items():
+                ns = build()
+                if b.unit == 'B':
+                    row[label] = len(eval(stmt, dict(ns)))
+                elif b.unit == 'B peak':
+                    row[label] = peak_allocation(stmt, ns, number)
+                elif b.unit == 'ns wall':
+                    row[label] = threaded_time(stmt, ns, number, repeat)
+                elif b.unit == 'us import':
+                    row[label] = import_time(stmt, ns, repeat)
+                else:
+                    row[label] = time_case(stmt, ns, number, repeat, b.ops)
+            results[key] = row
+            if out:
+                out.write(format_row(key, row, b.unit) + '\n')
+                out.flush()
+    finally:
+        close_fixtures()
+    return results
+
+
+def format_value(value, unit='ns'):
+    if value is None:
+        return '-'
+    if unit.startswith('B'):
+        return '{0}B'.format(value)
+    if unit == 'us import':
+        return '{0}us'.format(value)
+    return '{0:.1f}ns'.format(value)
+
+
+def format_row(key, row, unit='ns'):
+    cells = ['{0}={1}'.format(label, format_value(value, unit))
+             for label, value in row.items()]
+    return '{0:<28} {1}'.format(key, '  '.join(cells))
+
+
+def units():
+    """key -> unit of every benchmark"""
+    return collections.OrderedDict(
+        ('{0}.{1}'.format(b.group, b.name), b.unit) for b in BENCHMARKS)
+
+
+def environment():
+    return collections.OrderedDict([
+        ('implementation', sys.implementation.name),
+        ('python', platform.python_version()),
+        ('platform', platform.platform()),
+        ('machine', platform.machine()),
+    ])
+
+
+def default_path():
+    return os.path.join('bench_results', '{0}-{1}.{2}.json'.format(
+        sys.implementation.name, *sys.version_info[:2]))
+
+
+def save(path, results, number, repeat):
+    doc = environment()
+    doc['number'] = number
+    doc['repeat'] = repeat
+    every_unit = units()
+    doc['units'] = collections.OrderedDict(
+        (key, every_unit.get(key, 'ns')) for key in results)
+    doc['results'] = results
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(doc, f, indent=2)
+        f.write('\n')
+
+
+def compare(baseline, results, threshold):
+    """Yield (key, label, old, new, unit) for every case over threshold
+
+    `threshold` is a fraction, so 0.1 flags anything over 10% slower or
+    bigger; anything above a baseline of 0 (bytes allocated) is flagged.
+    Rows measured in another unit than in the baseline are skipped.
+    """
+    old_results = baseline.get('results', {})
+    old_units = baseline.get('units', {})
+    every_unit = units()
+    for key, row in results.items():
+        old_row = old_results.get(key, {})
+        unit = every_unit.get(key, 'ns')
+        if old_units.get(key, unit) != unit:
+            continue
+        for label, new in row.items():
+            old = old_row.get(label)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + threshold):
+                yield key, label, old, new, unit
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('groups', nargs='*',
+                        help='only run these groups (default: all)')
+    parser.add_argument('-n', '--number', type=int, default=100000,
+                        help='loops per timing (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='timings per case, best is kept '
+                             '(default: %(default)s)')
+    parser.add_argument('--save', nargs='?', const=default_path(),
+                        metavar='FILE',
+                        help='write JSON results (default: %(const)s)')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare against a saved JSON run')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='regression threshold in percent '
+                             '(default: %(default)s)')
+    parser.add_argument('--list', action='store_true',
+                        help='list benchmark groups and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for group in collections.OrderedDict.fromkeys(
+                b.group for b in BENCHMARKS):
+            print(group)
+        return 0
+
+    results = run(args.groups, args.number, args.repeat)
+
+    if args.save:
+        save(args.save, results, args.number, args.repeat)
+        print('saved {0}'.format(args.save))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = list(compare(baseline, results, args.threshold / 100))
+        for key, label, old, new, unit in regressions:
+            change = ('+{0:.0f}%'.format((new / old - 1) * 100) if old
+                      else 'was 0')
+            print('REGRESSION {0} [{1}]: {2} -> {3} ({4})'.format(
+                key, label, format_value(old, unit), format_value(new, unit),
+                change))
+        if regressions:
+            return 1
+        print('no regressions over {0}%'.format(args.threshold))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
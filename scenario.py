@@ -0,0 +1,223 @@
+# Copyright 2019 ashafer01
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""End-to-end benchmark of an optional storage backend
+
+The case from the README: a request handler keeps its database logic in a
+`with db.cursor() as cursor:` block, and the storage backend is optional.
+The handler runs against
+
+    sqlite-memory   a real sqlite3 backend in memory
+    sqlite-disk     a real sqlite3 backend in a file (WAL, synchronous=NORMAL)
+    Void            AbsorbingVoid, whose with block is skipped by VoidContext
+    None            None, with the handler guarding on `if db is not None`
+
+for every combination of block size (statements in the with block) and
+stack depth (calls between the request and the handler), reporting
+requests per second, p50 and p99 latency, and the peak bytes allocated by
+one request as in bench.py.
+
+    python scenario.py
+    python scenario.py --requests 20000 --blocks 1 10 --depths 0 50
+    python scenario.py --save scenario.json
+"""
+
+
+import argparse
+import collections
+import contextlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from void import AbsorbingVoid
+
+
+class Storage(object):
+    """A sqlite3 connection with the cursor() context manager of the README"""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        if path != ':memory:':
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS events '
+                                '(request INTEGER, item INTEGER)')
+
+    @contextlib.contextmanager
+    def cursor(self):
+        cursor = self.connection.cursor()
+        try:
+            yield cursor
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.connection.close()
+
+
+def handle(db, request, block, depth):
+    if depth:
+        return handle(db, request, block, depth - 1)
+    response = {'request': request, 'stored': block}
+    with db.cursor() as cursor:
+        for item in range(block):
+            cursor.execute('INSERT INTO events VALUES (?, ?)', (request, item))
+    return response
+
+
+def handle_guarded(db, request, block, depth):
+    if depth:
+        return handle_guarded(db, request, block, depth - 1)
+    response = {'request': request, 'stored': block}
+    if db is not None:
+        with db.cursor() as cursor:
+            for item in range(block):
+                cursor.execute('INSERT INTO events VALUES (?, ?)',
+                               (request, item))
+    return response
+
+
+@contextlib.contextmanager
+def backends():
+    """Yield label -> (handler, db) for every backend, closing them after"""
+    directory = tempfile.mkdtemp()
+    memory = Storage(':memory:')
+    disk = Storage(os.path.join(directory, 'scenario.db'))
+    try:
+        yield collections.OrderedDict([
+            ('sqlite-memory', (handle, memory)),
+            ('sqlite-disk', (handle, disk)),
+            ('Void', (handle, AbsorbingVoid)),
+            ('None', (handle_guarded, None)),
+        ])
+    finally:
+        memory.close()
+        disk.close()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def peak_allocation(handler, db, block, depth, requests=20):
+    """Peak bytes above the baseline while running one request, at worst"""
+    handler(db, 0, block, depth)
+    tracemalloc.start()
+    try:
+        worst = 0
+        for request in range(requests):
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            else:
+                # before 3.9 only a fresh start begins a new peak
+                tracemalloc.stop()
+                tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            handler(db, request, block, depth)
+            worst = max(worst, tracemalloc.get_traced_memory()[1] - before)
+        return worst
+    finally:
+        tracemalloc.stop()
+
+
+def measure(handler, db, block, depth, requests):
+    clock = time.perf_counter_ns
+    for request in range(min(requests, 100)):
+        handler(db, request, block, depth)
+    latencies = []
+    start = clock()
+    for request in range(requests):
+        before = clock()
+        handler(db, request, block, depth)
+        latencies.append(clock() - before)
+    elapsed = clock() - start
+    latencies.sort()
+    return collections.OrderedDict([
+        ('throughput', requests / elapsed * 1e9),
+        ('p50', percentile(latencies, 0.5) / 1e3),
+        ('p99', percentile(latencies, 0.99) / 1e3),
+        ('peak', peak_allocation(handler, db, block, depth)),
+    ])
+
+
+def run(requests, blocks, depths, out=sys.stdout):
+    results = []
+    with backends() as cases:
+        for block in blocks:
+            for depth in depths:
+                for label, (handler, db) in cases.items():
+                    row = collections.OrderedDict([('backend', label),
+                                                   ('block', block),
+                                                   ('depth', depth)])
+                    row.update(measure(handler, db, block, depth, requests))
+                    results.append(row)
+                    if out:
+                        out.write(format_row(row) + '\n')
+                        out.flush()
+    return results
+
+
+HEADER = '{0:<14} {1:>5} {2:>5} {3:>12} {4:>10} {5:>10} {6:>8}'.format(
+    'backend', 'block', 'depth', 'req/s', 'p50 us', 'p99 us', 'peak B')
+ROW = '{0:<14} {1:>5} {2:>5} {3:>12.0f} {4:>10.2f} {5:>10.2f} {6:>8}'
+
+
+def format_row(row):
+    return ROW.format(*row.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--requests', type=int, default=5000,
+                        help='requests per case (default: %(default)s)')
+    parser.add_argument('--blocks', type=int, nargs='+', default=[1, 10, 100],
+                        help='statements per with block '
+                             '(default: %(default)s)')
+    parser.add_argument('--depths', type=int, nargs='+', default=[0, 10, 50],
+                        help='calls above the handler (default: %(default)s)')
+    parser.add_argument('--save', metavar='FILE',
+                        help='write JSON results')
+    args = parser.parse_args(argv)
+
+    print(HEADER)
+    results = run(args.requests, args.blocks, args.depths)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': sys.version, 'requests': args.requests,
+                       'results': results}, f, indent=2)
+            f.write('\n')
+        print('saved {0}'.format(args.save))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,8 +19,229 @@
 # SOFTWARE.
 
 
-async def _async_no_op():
-    raise StopAsyncIteration
+import io
+import sys
+
+
+# preallocated return values, so that no VoidType operation allocates per call
+
+_none_hash = hash(None)
+_complex_zero = complex(0, 0)
+_exhausted = iter(())
+_empty_buffer = memoryview(b'')
+
+# attributes numpy probes for that have to be missing rather than None, for
+# the VoidType subclasses answering unknown attributes through __getattr__
+_ARRAY_PROBES = frozenset(('__array_interface__', '__array_struct__'))
+
+# finished asyncio futures handed out by the async protocols, created on first
+# use so that importing void never imports asyncio
+
+_entered = None
+_exited = None
+_stopped = None
+_stop = None
+_passed_in = None
+_passed_out = None
+
+
+def _prepare_async():
+    """Create the finished futures shared by every VoidType awaitable
+
+    Awaiting a done future returns (or raises) straight away without touching
+    its loop, so the same ones can be awaited from any loop or thread.
+    """
+    global _entered, _exited, _stopped, _stop, _passed_in, _passed_out
+    stop = StopAsyncIteration()
+    entered, exited, stopped, passed_in, passed_out = _finished_futures(
+        _void_context, stop)
+    _entered, _exited, _stopped, _stop = entered, exited, stopped, stop
+    _passed_in, _passed_out = passed_in, passed_out
+
+
+def _finished_futures(context, stop):
+    """Finished futures for entering context, exiting, stopping with stop,
+    and entering and exiting PassThroughVoid"""
+    import asyncio
+    loop = asyncio.new_event_loop()
+    try:
+        entered = loop.create_future()
+        entered.set_result(context)
+        exited = loop.create_future()
+        exited.set_result(True)
+        stopped = loop.create_future()
+        stopped.set_exception(stop)
+        # mark it retrieved, or collecting it logs the exception
+        stopped.exception()
+        passed_in = loop.create_future()
+        passed_in.set_result(PassThroughVoid)
+        passed_out = loop.create_future()
+        passed_out.set_result(False)
+    finally:
+        loop.close()
+    return entered, exited, stopped, passed_in, passed_out
+
+
+# how Void compares with an operand is decided once per type of operand:
+# numbers against 0, builtins by their truth, and anything else as before
+# or, after strict_comparisons(), without calling into it at all
+
+_strict = False
+
+_PLAIN_TYPES = frozenset((type(None), complex, str, bytes, bytearray, tuple,
+                          list, dict, set, frozenset, range, memoryview))
+
+
+def _operand_kind(cls):
+    if cls is int or cls is float or cls is bool:
+        return 'float'
+    if cls in _PLAIN_TYPES:
+        return 'plain'
+    if issubclass(cls, VoidType):
+        return 'real'
+    import numbers
+
+    if issubclass(cls, numbers.Real):
+        return 'real'
+    if issubclass(cls, numbers.Number):
+        return 'other'
+    return 'strict' if _strict else 'other'
+
+
+# Py_TPFLAGS_HEAPTYPE, set on classes created at runtime
+_HEAPTYPE = 1 << 9
+
+
+class _TypeDispatch(dict):
+    """type -> how Void compares with its instances, filled in on first use
+
+    Handlers are given per kind of type, see _operand_kind(): 'float' for
+    the builtin numbers, 'real' for other real numbers and VoidTypes,
+    'plain' for builtins that are not ordered against 0, 'other' for other
+    numbers (Decimal, complex subclasses) and, outside strict mode, anything
+    else, and 'strict' for everything else in strict mode.
+
+    Classes created at runtime (heap types) are kept weakly, in a table of
+    their own looked up from __missing__, so that being compared with Void
+    does not keep them alive; builtin and other static types live for good
+    anyway and are entries of the dict itself.
+    """
+
+    __slots__ = ('_handlers', '_classes', '_ref')
+
+    def __init__(self, **handlers):
+        super().__init__()
+        self._handlers = handlers
+        self._classes = {}
+        self._ref = None
+
+    def __missing__(self, cls):
+        if not cls.__flags__ & _HEAPTYPE:
+            handler = self._handlers[_operand_kind(cls)]
+            if len(self) < _MAX_STUBS:
+                self[cls] = handler
+            return handler
+        if self._ref is None:
+            import weakref
+
+            self._ref = weakref.ref
+        # weakref.ref() hands back the class's existing reference without a
+        # callback, so finding a class that has an entry allocates nothing
+        ref = self._ref(cls)
+        try:
+            return self._classes[ref]
+        except KeyError:
+            pass
+        import weakref
+
+        handler = self._handlers[_operand_kind(cls)]
+        if len(self._classes) < _MAX_STUBS:
+            self._classes[ref] = handler
+            weakref.finalize(cls, self._classes.pop, ref, None)
+        return handler
+
+    def clear(self):
+        super().clear()
+        self._classes.clear()
+
+
+def _true(other):
+    return True
+
+
+def _false(other):
+    return False
+
+
+def _falsey(other):
+    return not other
+
+
+def _le_zero(other):
+    return 0 <= other
+
+
+def _ge_zero(other):
+    return 0 >= other
+
+
+def _lt_zero(other):
+    return 0 < other
+
+
+def _gt_zero(other):
+    return 0 > other
+
+
+def _le_zero_or_falsey(other):
+    try:
+        return 0 <= other
+    except TypeError:
+        return not other
+
+
+def _ge_zero_or_falsey(other):
+    try:
+        return 0 >= other
+    except TypeError:
+        return not other
+
+
+def _unordered(symbol):
+    def unordered(other):
+        raise TypeError('{0!r} not supported between VoidType and {1!r}'
+                        .format(symbol, type(other).__name__))
+    return unordered
+
+
+_equal = _TypeDispatch(float=_falsey, real=_falsey, plain=_falsey,
+                       other=_falsey, strict=_false)
+_unequal = _TypeDispatch(float=bool, real=bool, plain=bool, other=bool,
+                         strict=_true)
+_at_most = _TypeDispatch(float=(0.0).__le__, real=_le_zero, plain=_falsey,
+                         other=_le_zero_or_falsey, strict=_false)
+_at_least = _TypeDispatch(float=(0.0).__ge__, real=_ge_zero, plain=_falsey,
+                          other=_ge_zero_or_falsey, strict=_false)
+_below = _TypeDispatch(float=(0.0).__lt__, real=_lt_zero, plain=_lt_zero,
+                       other=_lt_zero, strict=_unordered('<'))
+_above = _TypeDispatch(float=(0.0).__gt__, real=_gt_zero, plain=_gt_zero,
+                       other=_gt_zero, strict=_unordered('>'))
+
+
+def strict_comparisons(strict=True):
+    """Make Void compare without ever calling into operands of other types
+
+    By default `Void == x` is `not x`, which runs x's __bool__ or __len__:
+    a lazy query set gets evaluated and a NumPy array raises. In strict
+    mode only numbers, VoidTypes and builtins are compared as usual, and
+    any other x is unequal to Void, neither <= nor >= it, and raises
+    TypeError for < and >, all without touching x. strict_comparisons(False)
+    goes back to the default.
+    """
+    global _strict
+    _strict = strict
+    for table in (_equal, _unequal, _at_most, _at_least, _below, _above):
+        table.clear()
 
 
 class VoidType(object):
@@ -43,10 +264,32 @@ class VoidType(object):
 
     __slots__ = ('__weakref__',)
 
+    # only names defined on the class resolve normally, everything else is
+    # None (see __getattribute__), so subclasses keeping state use __slots__
+
+    def __init_subclass__(cls, **kwds):
+        super().__init_subclass__(**kwds)
+        cls._void_attrs = frozenset(dir(cls))
+        cls._void_dicts = tuple(klass.__dict__ for klass in cls.__mro__)
+
+    # pickle as a reference to the module singleton, and copy as itself;
+    # instances of subclasses pickle as a new instance of their class
+
+    def __reduce__(self):
+        if type(self) is VoidType:
+            return 'Void'
+        return type(self), ()
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
     # hash to None
 
     def __hash__(self):
-        return hash(None)
+        return _none_hash
 
     # be universally falsey
 
@@ -60,29 +303,38 @@ class VoidType(object):
         return 0
 
     def __eq__(self, other):
+        if _strict:
+            return _equal[type(other)](other)
         return not other
 
     def __ne__(self, other):
+        if _strict:
+            return _unequal[type(other)](other)
         return bool(other)
 
-    # be falsey for equality, and 0 for strictly numeric comparisons
+    # be falsey for equality, and 0 for strictly numeric comparisons, the
+    # way to compare decided once per type of other (see _TypeDispatch)
 
     def __le__(self, other):
-        try:
+        cls = type(other)
+        if cls is int or cls is float:
             return 0 <= other
-        except TypeError:
-            return not other
+        return _at_most[cls](other)
 
     def __ge__(self, other):
-        try:
+        cls = type(other)
+        if cls is int or cls is float:
             return 0 >= other
-        except TypeError:
-            return not other
+        return _at_least[cls](other)
 
     def __lt__(self, other):
+        if _strict:
+            return _below[type(other)](other)
         return 0 < other
 
     def __gt__(self, other):
+        if _strict:
+            return _above[type(other)](other)
         return 0 > other
 
     # always successfully emit none and discard input
@@ -93,8 +345,17 @@ class VoidType(object):
     def __getitem__(self, key):
         pass
 
-    def __getattr__(self, attr):
-        pass
+    def __getattribute__(self, attr):
+        # anything the class does not define skips the generic lookup, which
+        # would otherwise build and discard an AttributeError every time
+        cls = type(self)
+        if attr in cls._void_attrs:
+            return object.__getattribute__(self, attr)
+        # names set on the class or a base since are not in that snapshot,
+        # but in the (live) namespaces of the classes
+        for namespace in cls._void_dicts:
+            if attr in namespace:
+                return object.__getattribute__(self, attr)
 
     def __setitem__(self, key, value):
         pass
@@ -111,7 +372,7 @@ class VoidType(object):
     # numeric conversions are all 0 or similar
 
     def __complex__(self):
-        return complex(0, 0)
+        return _complex_zero
 
     def __float__(self):
         return 0.0
@@ -148,37 +409,54 @@ class VoidType(object):
     # exit context managers immediately and successfully (see VoidContext def)
 
     def __enter__(self):
-        return VoidContext()
+        return _void_context
 
     def __exit__(self, etype, e, trace):
+        if e is _void_exception:
+            # drop the frames of the aborted block so the next raise starts
+            # clean and nothing stays alive between blocks
+            e.__traceback__ = None
+            e.__context__ = None
         return True
 
-    async def __aenter__(self):
-        return VoidContext()
+    def __aenter__(self):
+        if _entered is None:
+            _prepare_async()
+        return _entered
 
-    async def __aexit__(self, etype, e, trace):
-        async def exit():
-            return True
-        return exit
+    def __aexit__(self, etype, e, trace):
+        if type(e) is VoidException:
+            e.__traceback__ = None
+            e.__context__ = None
+        if _exited is None:
+            _prepare_async()
+        return _exited
 
     # iterate over nothing / behave like empty sequence
 
     def __iter__(self):
-        return self
+        return _exhausted
 
     def __reversed__(self):
-        return self
+        return _exhausted
 
     def __bytes__(self):
         return b''
 
+    # export an empty, read-only buffer, to memoryview(), hashlib, os.writev()
+    # and every other zero-copy consumer; only Python 3.12+ looks this up
+    # (PEP 688), see as_buffer() for older versions
+
+    def __buffer__(self, flags):
+        return _empty_buffer
+
     def __contains__(self, other):
         return False
 
     # be a no-op coroutine and generator-iterator
 
     def __await__(self):
-        return self
+        return _exhausted
 
     def __next__(self):
         raise StopIteration
@@ -197,17 +475,24 @@ class VoidType(object):
     def __aiter__(self):
         return self
 
-    async def __anext__(self):
-        raise StopAsyncIteration
+    def __anext__(self):
+        if _stopped is None:
+            _prepare_async()
+        # before 3.10 every raise from the future adds to the traceback of
+        # the one shared exception, holding on to the frames it went through
+        _stop.__traceback__ = None
+        return _stopped
 
-    async def asend(self, value):
-        return _async_no_op
+    # awaiting Void itself finishes immediately with None
 
-    async def athrow(self, type, value=None, traceback=None):
-        return _async_no_op
+    def asend(self, value):
+        return self
+
+    def athrow(self, type, value=None, traceback=None):
+        return self
 
-    async def aclose(self):
-        return _async_no_op
+    def aclose(self):
+        return self
 
     # All operators follow the "always emit None" paradigm
     # Many are "usually mathematic" and could behave like 0, but since they
@@ -353,119 +638,166 @@ class VoidType(object):
     def __invert__(self):
         return self
 
+    # NumPy: ufuncs and array functions given Void answer None straight
+    # away, like the operators above, instead of coercing Void to an object
+    # array and looping; converting it gives an empty array. None of this
+    # imports numpy, it is only ever called by numpy itself.
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwds):
+        out = kwds.get('out')
+        if out:
+            # in-place operations keep their array, untouched
+            return out[0] if len(out) == 1 else out
+
+    def __array_function__(self, func, types, args, kwds):
+        pass
+
+    def __array__(self, dtype=None, copy=None):
+        return sys.modules['numpy'].empty(0, dtype)
+
+    # unlike other unknown attributes these must be missing, not None, or
+    # numpy takes them for an (invalid) array interface (see _ARRAY_PROBES)
+
+    @property
+    def __array_interface__(self):
+        raise AttributeError('__array_interface__')
+
+    @property
+    def __array_struct__(self):
+        raise AttributeError('__array_struct__')
+
 
 class VoidException(BaseException):
-    """Use a BaseException to hopefully bypass any user exception handling"""
+    """Use a BaseException to hopefully bypass any user exception handling
+
+    Only one instance is ever raised, or one per thread on free-threaded
+    builds. Every raise starts it with an empty traceback, so one caught
+    inside the block cannot keep growing it, and VoidType.__exit__ clears
+    it again once the block has been skipped.
+    """
     pass
 
 
 class VoidContext(object):
-    """Always raises an exception to immediately exit the context"""
+    """Always raises an exception to immediately exit the context
+
+    VoidType hands out the same instance from every __enter__, or the same
+    per thread on free-threaded builds.
+    """
 
     # save memory
     __slots__ = ('__weakref__',)
 
+    def __reduce__(self):
+        return '_void_context'
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
     def __bool__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __len__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __length_hint__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __eq__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __le__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __ge__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __gt__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __lt__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __call__(self, *args, **kwds):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __getitem__(self, key):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __getattr__(self, attr):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __setitem__(self, key, value):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __setattr__(self, attr, value):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __delitem__(self, key):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __delattr__(self, attr):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __complex__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __float__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __int__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __index__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __round__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __trunc__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __floor__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __ceil__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __str__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __repr__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __format__(self, format_spec):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __enter__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __exit__(self, etype, e, trace):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __aenter__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __aexit__(self, etype, e, trace):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __iter__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __reversed__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __bytes__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
-    def __contains__(self):
-        raise VoidException()
+    def __contains__(self, other):
+        raise self._void_exception.with_traceback(None)
 
     def __await__(self):
         return self
@@ -479,149 +811,2652 @@ class VoidContext(object):
     def __anext__(self):
         raise StopAsyncIteration
 
-    async def asend(self, value):
-        return _async_no_op
+    def asend(self, value):
+        return self
 
-    async def athrow(self, type, value=None, traceback=None):
-        return _async_no_op
+    def athrow(self, type, value=None, traceback=None):
+        return self
 
-    async def aclose(self):
-        return _async_no_op
+    def aclose(self):
+        return self
 
     def __add__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __sub__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __mul__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __matmul__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __truediv__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __floordiv__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __mod__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __divmod__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __pow__(self, other, modulo=None):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __lshift__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rshift__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __and__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __xor__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __or__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __radd__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rsub__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rmul__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rmatmul__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rtruediv__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rfloordiv__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rmod__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rdivmod__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rpow__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rlshift__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rrshift__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rand__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __rxor__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __ror__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __iadd__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __isub__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __imul__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __imatmul__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __itruediv__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __ifloordiv__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __imod__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __ipow__(self, other, modulo=None):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __ilshift__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __irshift__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __iand__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __ixor__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __ior__(self, other):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __neg__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __pos__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __abs__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
     def __invert__(self):
-        raise VoidException()
+        raise self._void_exception.with_traceback(None)
 
 
 Void = VoidType()
+
+VoidType._void_attrs = frozenset(dir(VoidType))
+VoidType._void_dicts = (VoidType.__dict__, object.__dict__)
+_void_exception = VoidException()
+VoidContext._void_exception = _void_exception
+_void_context = VoidContext()
+
+
+# free-threaded builds hand out a context, exception and finished futures
+# per thread instead: every raise writes the exception's traceback and every
+# __enter__ or await takes a reference to what it returns, which on shared
+# objects serializes the threads
+
+_local = None
+
+
+class _ThreadVoidContext(VoidContext):
+    """A VoidContext raising a VoidException of its own"""
+
+    __slots__ = ('_void_exception',)
+
+
+def _free_threaded():
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def _thread_context():
+    global _local
+    if _local is None:
+        import threading
+
+        _local = threading.local()
+    context = _ThreadVoidContext()
+    _ThreadVoidContext._void_exception.__set__(context, VoidException())
+    _local.context = context
+    return context
+
+
+def _enter_per_thread(self):
+    try:
+        return _local.context
+    except AttributeError:
+        return _thread_context()
+
+
+def _exit_per_thread(self, etype, e, trace):
+    if type(e) is VoidException:
+        e.__traceback__ = None
+        e.__context__ = None
+    return True
+
+
+def _thread_async():
+    """The thread's own finished futures, see _prepare_async()"""
+    try:
+        context = _local.context
+    except AttributeError:
+        context = _thread_context()
+    stop = StopAsyncIteration()
+    (_local.entered, _local.exited, _local.stopped, _local.passed_in,
+     _local.passed_out) = _finished_futures(context, stop)
+    _local.stop = stop
+    return _local
+
+
+def _aenter_per_thread(self):
+    try:
+        return _local.entered
+    except AttributeError:
+        return _thread_async().entered
+
+
+def _aexit_per_thread(self, etype, e, trace):
+    if type(e) is VoidException:
+        e.__traceback__ = None
+        e.__context__ = None
+    try:
+        return _local.exited
+    except AttributeError:
+        return _thread_async().exited
+
+
+def _anext_per_thread(self):
+    try:
+        stopped = _local.stopped
+    except AttributeError:
+        stopped = _thread_async().stopped
+    _local.stop.__traceback__ = None
+    return stopped
+
+
+def _pass_in_per_thread(self):
+    try:
+        return _local.passed_in
+    except AttributeError:
+        return _thread_async().passed_in
+
+
+def _pass_out_per_thread(self, etype, e, trace):
+    try:
+        return _local.passed_out
+    except AttributeError:
+        return _thread_async().passed_out
+
+
+if _free_threaded():
+    VoidType.__enter__ = _enter_per_thread
+    VoidType.__exit__ = _exit_per_thread
+    VoidType.__aenter__ = _aenter_per_thread
+    VoidType.__aexit__ = _aexit_per_thread
+    VoidType.__anext__ = _anext_per_thread
+
+
+def as_buffer(obj):
+    """obj itself, or a new empty memoryview if obj is a VoidType
+
+    Before Python 3.12 classes written in Python cannot export buffers, so
+    APIs taking bytes-like objects reject Void; passing them as_buffer(x)
+    instead of x works on every version without copying anything. The view
+    is the caller's own, so releasing it leaves every other one usable.
+    """
+    if isinstance(obj, VoidType):
+        return memoryview(_empty_buffer)
+    return obj
+
+
+# compile-time elision of `with Void` blocks
+
+_ELIDE_VOID = '_void_elide_Void'
+_ELIDE_CONTEXT = '_void_elide_context'
+_ELIDE_FACTORY = '_void_elide_factory'
+
+
+def elide_void(func):
+    """Decorator rewriting every with/async with block in func to skip Void
+
+    Each context manager expression is evaluated once and checked with `is`
+    against Void; if it is Void the block is never entered, nothing is raised
+    and any simple `as` target is bound to the VoidContext, just as after a
+    block VoidType.__exit__ swallowed. Anything else runs the original block.
+
+    Unlike the exception-based path, statements in the block before the first
+    touch of the VoidContext do not run either. Apply it directly above the
+    def, since it recompiles the function from its source.
+    """
+    fdef = _elide_withs(_function_def(func, 'elide_void'))
+    return _recompile(func, fdef, {_ELIDE_VOID: Void,
+                                   _ELIDE_CONTEXT: _void_context})
+
+
+def _function_def(func, decorator):
+    """Parse the source of func into its (undecorated) def statement"""
+    import ast
+    import inspect
+    import textwrap
+
+    source = textwrap.dedent(inspect.getsource(func))
+    tree = ast.parse(source)
+    ast.increment_lineno(tree, func.__code__.co_firstlineno - 1)
+    fdef = tree.body[0]
+    if not isinstance(fdef, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        raise TypeError('{0} only applies to functions'.format(decorator))
+    fdef.decorator_list = []
+    return fdef
+
+
+def _recompile(func, fdef, extra):
+    """Compile a rewritten def of func into a function standing in for it
+
+    Names in extra are made available to the new code as closure cells
+    holding the given values.
+    """
+    import ast
+    import types
+
+    # compile it inside a factory declaring the extra names and the
+    # function's own free variables, so they all become closure cells that
+    # are swapped for the real ones below; a class by the same name keeps
+    # private name mangling and super() working for methods
+    free = tuple(extra) + func.__code__.co_freevars
+    factory = ast.FunctionDef(
+        name=_ELIDE_FACTORY,
+        args=ast.arguments(posonlyargs=[], args=[], vararg=None,
+                           kwonlyargs=[], kw_defaults=[], kwarg=None,
+                           defaults=[]),
+        body=[
+            fdef,
+            ast.Return(ast.Name(fdef.name, ast.Load())),
+        ],
+        decorator_list=[],
+    )
+    if free:
+        factory.body.insert(0, ast.Assign(
+            targets=[ast.Name(name, ast.Store()) for name in free],
+            value=ast.Constant(None)))
+    qualname = func.__qualname__.split('.')
+    if len(qualname) > 1 and qualname[-2] != '<locals>':
+        factory = ast.ClassDef(name=qualname[-2], bases=[], keywords=[],
+                               body=[factory], decorator_list=[])
+    module = ast.Module(body=[factory], type_ignores=[])
+    ast.copy_location(factory, fdef)
+    ast.fix_missing_locations(module)
+    code = compile(module, func.__code__.co_filename, 'exec')
+
+    code = _find_code(_find_code(code, _ELIDE_FACTORY), func.__name__)
+    cells = dict(zip(func.__code__.co_freevars, func.__closure__ or ()))
+    for name, value in extra.items():
+        cells[name] = types.CellType(value)
+    compiled = types.FunctionType(
+        code, func.__globals__, func.__name__, func.__defaults__,
+        tuple(cells[name] for name in code.co_freevars))
+    compiled.__kwdefaults__ = func.__kwdefaults__
+    compiled.__qualname__ = func.__qualname__
+    compiled.__module__ = func.__module__
+    compiled.__doc__ = func.__doc__
+    compiled.__annotations__ = func.__annotations__
+    compiled.__dict__.update(func.__dict__)
+    compiled.__wrapped__ = func
+    return compiled
+
+
+def _find_code(code, name):
+    for const in code.co_consts:
+        if hasattr(const, 'co_name'):
+            if const.co_name == name:
+                return const
+            found = _find_code(const, name)
+            if found is not None:
+                return found
+
+
+def _elide_withs(node):
+    import ast
+
+    class ElideVoid(ast.NodeTransformer):
+        """Turns `with a as x, b: body` into
+
+            _void_cm_1 = a
+            if _void_cm_1 is Void:
+                x = <VoidContext>
+            else:
+                with _void_cm_1 as x:
+                    <the same for b, wrapping body>
+        """
+
+        def __init__(self):
+            self.count = 0
+
+        def visit_With(self, node):
+            self.generic_visit(node)
+            return self.elide(node, node.items, ast.With)
+
+        def visit_AsyncWith(self, node):
+            self.generic_visit(node)
+            return self.elide(node, node.items, ast.AsyncWith)
+
+        def elide(self, node, items, kind):
+            item = items[0]
+            if len(items) > 1:
+                body = self.elide(node, items[1:], kind)
+            else:
+                body = node.body
+            self.count += 1
+            name = '_void_cm_{0}'.format(self.count)
+
+            target = item.optional_vars
+            if target is None or isinstance(target, (ast.Tuple, ast.List)):
+                # unpacking the VoidContext would have aborted the block
+                skip = [ast.Pass()]
+            else:
+                skip = [ast.Assign(targets=[target],
+                                   value=ast.Name(_ELIDE_CONTEXT, ast.Load()))]
+
+            stmts = [
+                ast.Assign(targets=[ast.Name(name, ast.Store())],
+                           value=item.context_expr),
+                ast.If(
+                    test=ast.Compare(
+                        left=ast.Name(name, ast.Load()),
+                        ops=[ast.Is()],
+                        comparators=[ast.Name(_ELIDE_VOID, ast.Load())]),
+                    body=skip,
+                    orelse=[kind(
+                        items=[ast.withitem(ast.Name(name, ast.Load()),
+                                            target)],
+                        body=body)]),
+            ]
+            for stmt in stmts:
+                ast.copy_location(stmt, node)
+            return stmts
+
+    return ElideVoid().visit(node)
+
+
+# specializing functions for Void arguments
+
+def specialize_void(func=None, *, maxsize=32):
+    """Decorator compiling versions of func for calls given Void arguments
+
+    The first call passing Void or AbsorbingVoid for some parameters (or
+    leaving them at such a default) builds a version of func without the
+    statements whose only effect is to use those arguments: calls like
+    `backend(x)`, item and attribute assignments and deletions, and for
+    AbsorbingVoid whole chains like `backend.client.put(x)`. Arguments to a
+    removed statement must be plain names, constants, tuples, lists or slices,
+    so dropping it cannot skip other side effects; a parameter the function
+    ever rebinds is never specialized for. Plain Void only absorbs one level,
+    so `backend.put(x)` is left in place, raising just as before.
+
+    Versions are kept in an LRU cache of maxsize entries keyed by which
+    parameters were void (cache_info() reports on it); calls without void
+    arguments, and any void combination that removes nothing, run func
+    itself. Like elide_void, it recompiles func from source, so apply it
+    directly above the def.
+    """
+    import functools
+
+    if func is None:
+        return functools.partial(specialize_void, maxsize=maxsize)
+
+    code = func.__code__
+    positional = code.co_varnames[:code.co_argcount]
+    keyword = code.co_varnames[:code.co_argcount + code.co_kwonlyargcount]
+    voids = {VoidType: VoidType, AbsorbingVoidType: AbsorbingVoidType}
+
+    # parameters left at a void default are void as well
+    defaults = dict(zip(positional[len(positional) -
+                                   len(func.__defaults__ or ()):],
+                        func.__defaults__ or ()))
+    defaults.update(func.__kwdefaults__ or {})
+    void_defaults = [(name, type(value)) for name, value in defaults.items()
+                     if type(value) in voids]
+
+    @functools.lru_cache(maxsize)
+    def version(void):
+        try:
+            return _specialize(func, void)
+        except (OSError, TypeError, SyntaxError):
+            # no source to work from
+            return func
+
+    # the key marks which positional and keyword arguments were void (None
+    # for the others), which together with the keywords passed also tells
+    # which defaults were used
+    @functools.lru_cache(maxsize)
+    def specialized(key):
+        void, passed = {}, set()
+        for index, item in enumerate(key):
+            if isinstance(item, tuple):
+                name, cls = item
+            elif index < len(positional):
+                name, cls = positional[index], item
+            else:
+                continue
+            passed.add(name)
+            if cls is not None and name in keyword:
+                void[name] = cls
+        for name, cls in void_defaults:
+            if name not in passed:
+                void[name] = cls
+        if not void:
+            return func
+        return version(frozenset(void.items()))
+
+    @functools.wraps(func)
+    def dispatch(*args, **kwds):
+        if not (kwds or void_defaults):
+            for arg in args:
+                if type(arg) in voids:
+                    break
+            else:
+                return func(*args)
+        key = tuple(map(voids.get, map(type, args)))
+        if kwds:
+            key += tuple(zip(kwds, map(voids.get, map(type, kwds.values()))))
+        return specialized(key)(*args, **kwds)
+
+    def cache_clear():
+        specialized.cache_clear()
+        version.cache_clear()
+
+    dispatch.cache_info = version.cache_info
+    dispatch.cache_clear = cache_clear
+    return dispatch
+
+
+def _specialize(func, key):
+    import ast
+
+    fdef = _function_def(func, 'specialize_void')
+
+    # a parameter that is ever rebound may not be void where it is used
+    rebound = set()
+    captures = tuple(getattr(ast, name) for name in
+                     ('MatchAs', 'MatchStar', 'MatchMapping')
+                     if hasattr(ast, name))
+    for node in ast.walk(fdef):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            rebound.add(node.id)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            rebound.update(node.names)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                               ast.ClassDef)):
+            if node is not fdef:
+                rebound.add(node.name)
+        elif isinstance(node, ast.alias):
+            rebound.add(node.asname or node.name.partition('.')[0])
+        elif isinstance(node, ast.ExceptHandler):
+            if node.name:
+                rebound.add(node.name)
+        elif isinstance(node, captures):
+            name = getattr(node, 'name', None) or getattr(node, 'rest', None)
+            if name:
+                rebound.add(name)
+    absorbing = {name: cls is AbsorbingVoidType for name, cls in key
+                 if name not in rebound}
+    if not absorbing:
+        return func
+
+    def pure(node):
+        if isinstance(node, (ast.Constant, ast.Name)):
+            return True
+        if isinstance(node, (ast.Tuple, ast.List)):
+            return all(map(pure, node.elts))
+        if isinstance(node, ast.Slice):
+            return all(pure(part) for part in (node.lower, node.upper,
+                                               node.step) if part is not None)
+        return False
+
+    def chain(node):
+        """Depth of the void parameter at the root of node, or None
+
+        Anything evaluated on the way down must be pure.
+        """
+        depth = 0
+        while not isinstance(node, ast.Name):
+            if isinstance(node, ast.Call):
+                if not (all(map(pure, node.args)) and
+                        all(k.arg is not None and pure(k.value)
+                            for k in node.keywords)):
+                    return None
+                node = node.func
+            elif isinstance(node, ast.Subscript):
+                if not pure(node.slice):
+                    return None
+                node = node.value
+            elif isinstance(node, (ast.Attribute, ast.Await)):
+                node = node.value
+            else:
+                return None
+            depth += 1
+        if node.id not in absorbing:
+            return None
+        # Void answers one operation with None, AbsorbingVoid with itself
+        if depth > 1 and not absorbing[node.id]:
+            return None
+        return depth
+
+    def inert(node):
+        return chain(node) is not None
+
+    def void_target(node):
+        return isinstance(node, (ast.Attribute, ast.Subscript)) and \
+            inert(node)
+
+    class Specialize(ast.NodeTransformer):
+        def __init__(self):
+            self.removed = 0
+
+        def visit_Expr(self, node):
+            return self.remove(node, inert(node.value))
+
+        def visit_Assign(self, node):
+            return self.remove(node, len(node.targets) == 1 and
+                               void_target(node.targets[0]) and
+                               pure(node.value))
+
+        def visit_Delete(self, node):
+            return self.remove(node, all(map(void_target, node.targets)))
+
+        def remove(self, node, removable):
+            if removable:
+                self.removed += 1
+                return None
+            return node
+
+        # nested scopes are left alone
+
+        def visit_FunctionDef(self, node):
+            return node
+
+        visit_AsyncFunctionDef = visit_ClassDef = visit_Lambda = \
+            visit_FunctionDef
+
+    specialize = Specialize()
+    specialize.generic_visit(fdef)
+    if not specialize.removed:
+        return func
+    for node in ast.walk(fdef):
+        body = getattr(node, 'body', None)
+        if isinstance(body, list) and not body:
+            body.append(ast.copy_location(ast.Pass(), node))
+    return _recompile(func, fdef, {})
+
+
+# runtime instrumentation
+
+_ENTER = frozenset(('__enter__', '__aenter__'))
+_EXIT = frozenset(('__exit__', '__aexit__'))
+
+
+class VoidInstrumentation(object):
+    """Counts protocol calls and with-block call sites of a VoidType subclass
+
+    Nothing is recorded until enable() is called, and disable() puts the class
+    back to costing exactly what VoidType does. On Python 3.12+ the counts come
+    from sys.monitoring PY_START events on the class's own copies of the
+    VoidType methods; elsewhere counting wrappers are set on the class while
+    enabled and removed again afterwards.
+
+    `calls` maps method name to count, `entered` and `aborted` map a
+    (filename, lineno) with-statement site to how often a block there was
+    entered, and how often it was cut short by touching the VoidContext.
+    """
+
+    def __init__(self, cls):
+        import contextvars
+        import types
+
+        self.cls = cls
+        self.enabled = False
+        self.calls = {}
+        self.entered = {}
+        self.aborted = {}
+        # the sites of the blocks entered and not yet exited, per thread and
+        # task: where a block is aborted is known when it is entered only
+        self._sites = contextvars.ContextVar('void_sites', default=())
+        self._names = tuple(name for name, value in vars(VoidType).items()
+                            if isinstance(value, types.FunctionType) and
+                            name != '__init_subclass__')
+        # methods the class overrides itself are counted in place of
+        # VoidType's
+        self._own = {name: vars(cls)[name] for name in self._names
+                     if name in vars(cls)}
+        self._monitoring = getattr(sys, 'monitoring', None)
+        self._tool = None
+        self._codes = {}
+        if self._monitoring is not None:
+            # give the class code objects of its own, so only it is monitored
+            for name in self._names:
+                func = self._method(name)
+                copy = types.FunctionType(
+                    func.__code__.replace(), func.__globals__, name,
+                    func.__defaults__, func.__closure__)
+                copy.__qualname__ = '{0}.{1}'.format(cls.__qualname__, name)
+                setattr(cls, name, copy)
+                self._codes[copy.__code__] = name
+
+    def enable(self):
+        if self.enabled:
+            return
+        if self._monitoring is not None:
+            self._enable_monitoring()
+        else:
+            for name in self._names:
+                setattr(self.cls, name,
+                        self._counting(name, self._method(name)))
+        self.enabled = True
+
+    def _method(self, name):
+        return self._own.get(name) or vars(VoidType)[name]
+
+    def disable(self):
+        if not self.enabled:
+            return
+        if self._monitoring is not None:
+            monitoring = self._monitoring
+            for code in self._codes:
+                monitoring.set_local_events(self._tool, code, 0)
+            monitoring.register_callback(
+                self._tool, monitoring.events.PY_START, None)
+            monitoring.free_tool_id(self._tool)
+            self._tool = None
+        else:
+            for name in self._names:
+                if name in self._own:
+                    setattr(self.cls, name, self._own[name])
+                else:
+                    delattr(self.cls, name)
+        self.enabled = False
+
+    def reset(self):
+        self.calls.clear()
+        self.entered.clear()
+        self.aborted.clear()
+
+    def report(self, limit=20):
+        """Hot spots as text, most frequent first"""
+        lines = ['{0} protocol calls'.format(self.cls.__name__)]
+        for name, count in _most_common(self.calls, limit):
+            lines.append('  {0:>10}  {1}'.format(count, name))
+        lines.append('with blocks (entered, aborted)')
+        for (filename, lineno), count in _most_common(self.entered, limit):
+            lines.append('  {0:>10}  {1:>10}  {2}:{3}'.format(
+                count, self.aborted.get((filename, lineno), 0),
+                filename, lineno))
+        return '\n'.join(lines)
+
+    def dump(self, file=None, limit=20):
+        print(self.report(limit), file=file or sys.stderr)
+
+    def _entering(self, frame):
+        site = (frame.f_code.co_filename, frame.f_lineno)
+        self.entered[site] = self.entered.get(site, 0) + 1
+        self._sites.set(self._sites.get() + (site,))
+
+    def _exiting(self, e):
+        sites = self._sites.get()
+        if not sites:
+            # entered before enable()
+            return
+        self._sites.set(sites[:-1])
+        if type(e) is VoidException:
+            site = sites[-1]
+            self.aborted[site] = self.aborted.get(site, 0) + 1
+
+    def _counting(self, name, method):
+        calls = self.calls
+        if name in _ENTER:
+            def counted(this):
+                calls[name] = calls.get(name, 0) + 1
+                self._entering(sys._getframe(1))
+                return method(this)
+        elif name in _EXIT:
+            def counted(this, etype, e, trace):
+                calls[name] = calls.get(name, 0) + 1
+                self._exiting(e)
+                return method(this, etype, e, trace)
+        else:
+            def counted(this, *args, **kwds):
+                calls[name] = calls.get(name, 0) + 1
+                return method(this, *args, **kwds)
+        counted.__name__ = name
+        return counted
+
+    def _enable_monitoring(self):
+        monitoring = self._monitoring
+        for tool in range(6):
+            if monitoring.get_tool(tool) is None:
+                break
+        else:
+            raise RuntimeError('no free sys.monitoring tool id')
+        monitoring.use_tool_id(tool, 'void')
+        self._tool = tool
+
+        codes = self._codes
+        calls = self.calls
+
+        def started(code, offset):
+            name = codes[code]
+            calls[name] = calls.get(name, 0) + 1
+            if name in _ENTER:
+                self._entering(sys._getframe(2))
+            elif name in _EXIT:
+                self._exiting(sys._getframe(1).f_locals['e'])
+
+        monitoring.register_callback(tool, monitoring.events.PY_START,
+                                     started)
+        for code in codes:
+            monitoring.set_local_events(tool, code,
+                                        monitoring.events.PY_START)
+
+
+def _most_common(counts, limit):
+    return sorted(counts.items(), key=lambda item: -item[1])[:limit]
+
+
+class InstrumentedVoidType(VoidType):
+    """VoidType whose protocol calls can be counted at runtime
+
+    Controlled by the module level `instrumentation`; while that is disabled
+    it behaves and costs exactly like VoidType.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return 'InstrumentedVoid'
+
+
+InstrumentedVoid = InstrumentedVoidType()
+instrumentation = VoidInstrumentation(InstrumentedVoidType)
+
+
+# typed null objects
+
+_null_objects = None
+
+
+def null_of(cls):
+    """A null object standing in for an instance of cls
+
+    The object is a VoidType whose public methods and properties mirror those
+    of cls as precompiled no-ops returning an empty value matching their
+    return annotation: [] for list, {} for dict, 0 for int, '' for str, None
+    for None, Void for context managers and awaitables, null_of(T) for any
+    other class T, and Void when there is no annotation. Public class level
+    data is copied, and isinstance(obj, cls) holds.
+
+    Results are cached by class in a weak-keyed table: repeated calls return
+    the same object, and an entry goes away with its class since the null
+    object only refers back to it weakly.
+    """
+    global _null_objects
+    import weakref
+
+    if _null_objects is None:
+        _null_objects = weakref.WeakKeyDictionary()
+    null = _null_objects.get(cls)
+    if null is None:
+        null = _null_objects[cls] = _build_null(cls)()
+    return null
+
+
+def _null_getattr(self, attr):
+    if attr in _ARRAY_PROBES:
+        raise AttributeError(attr)
+
+
+def _build_null(cls):
+    import inspect
+    import weakref
+
+    real = weakref.ref(cls)
+    namespace = {
+        '__slots__': (),
+        '__doc__': cls.__doc__,
+        # isinstance() falls back to __class__ when the type does not match
+        '__class__': property(lambda self: real() or type(self)),
+        # most lookups hit the mirrored methods, so let those take the
+        # normal fast path instead of VoidType.__getattribute__
+        '__getattribute__': object.__getattribute__,
+        '__getattr__': _null_getattr,
+    }
+    name = cls.__qualname__
+    namespace['__str__'] = namespace['__repr__'] = (
+        lambda self: 'null_of({0})'.format(name))
+    # unpickle to the cached null object of the (importable) class
+    namespace['__reduce__'] = lambda self: (null_of, (real(),))
+
+    for attr in dir(cls):
+        if attr.startswith('_'):
+            continue
+        value = inspect.getattr_static(cls, attr)
+        if isinstance(value, property):
+            namespace[attr] = property(_null_method(value.fget))
+        elif isinstance(value, staticmethod):
+            namespace[attr] = staticmethod(_null_method(value.__func__))
+        elif isinstance(value, classmethod):
+            namespace[attr] = classmethod(_null_method(value.__func__))
+        elif inspect.isfunction(value):
+            namespace[attr] = _null_method(value)
+        elif not callable(value) and not hasattr(value, '__get__'):
+            namespace[attr] = value
+
+    null = type('Null' + cls.__name__, (VoidType,), namespace)
+    null.__qualname__ = 'Null' + name
+    null.__module__ = cls.__module__
+    return null
+
+
+def _null_method(func):
+    """A precompiled no-op returning the empty value for func's return type"""
+    import inspect
+
+    value, factory = _empty_for(_return_annotation(func))
+    if inspect.iscoroutinefunction(func):
+        if factory is None:
+            async def method(*args, **kwds):
+                return value
+        else:
+            async def method(*args, **kwds):
+                return factory()
+    elif factory is None:
+        def method(*args, **kwds):
+            return value
+    else:
+        def method(*args, **kwds):
+            return factory()
+    method.__name__ = func.__name__
+    method.__qualname__ = 'Null' + func.__qualname__
+    method.__doc__ = func.__doc__
+    return method
+
+
+def _return_annotation(func):
+    import typing
+
+    try:
+        return typing.get_type_hints(func).get('return', Void)
+    except Exception:
+        # unresolvable forward references and the like
+        annotation = getattr(func, '__annotations__', {}).get('return', Void)
+        return annotation if isinstance(annotation, type) else Void
+
+
+_EMPTY_VALUES = (bool, int, float, complex, str, bytes, tuple, frozenset)
+_EMPTY_FACTORIES = (list, dict, set, bytearray)
+
+
+def _empty_for(annotation):
+    """(value, None) for a shared empty value, (None, factory) for fresh ones"""
+    import collections.abc as abc
+    import types
+    import typing
+    import weakref
+
+    if annotation is Void:
+        return Void, None
+    if annotation is None or annotation is type(None):
+        return None, None
+    origin = typing.get_origin(annotation) or annotation
+    # X | None (PEP 604) is a types.UnionType from Python 3.10 on
+    if origin is typing.Union or origin is getattr(types, 'UnionType', None):
+        if type(None) in typing.get_args(annotation):
+            return None, None
+        # the empty value of the first member will have to do
+        return _empty_for(typing.get_args(annotation)[0])
+    if not isinstance(origin, type):
+        return Void, None
+
+    if origin in _EMPTY_VALUES:
+        return origin(), None
+    if origin in _EMPTY_FACTORIES:
+        return None, origin
+    if issubclass(origin, _EMPTY_VALUES + _EMPTY_FACTORIES):
+        # subclasses like NamedTuples and IntEnums may need arguments
+        try:
+            value = origin()
+        except Exception:
+            return Void, None
+        if issubclass(origin, _EMPTY_FACTORIES):
+            return None, origin
+        return value, None
+    if issubclass(origin, (abc.Awaitable, abc.AsyncIterable,
+                           typing.ContextManager,
+                           typing.AsyncContextManager)):
+        return Void, None
+    if issubclass(origin, abc.Iterator):
+        return _exhausted, None
+    if issubclass(origin, abc.MutableMapping):
+        return None, dict
+    if issubclass(origin, abc.MutableSet):
+        return None, set
+    if issubclass(origin, abc.MutableSequence):
+        return None, list
+    if issubclass(origin, abc.Set):
+        return frozenset(), None
+    if issubclass(origin, abc.Mapping):
+        return None, dict
+    if issubclass(origin, (abc.Sequence, abc.Iterable, abc.Container,
+                           abc.Sized)):
+        return (), None
+    if origin is object or origin.__module__ == 'builtins':
+        return Void, None
+    # weakly, so a class returning itself does not keep its entry alive
+    real = weakref.ref(origin)
+    return None, lambda: null_of(real())
+
+
+# chain absorption
+
+_MAX_STUBS = 4096
+
+
+class AbsorbingVoidType(VoidType):
+    """VoidType whose attributes, calls and items all return itself
+
+    Whole call chains like `backend.client.bucket('x').put(obj)` are absorbed
+    by the one instance, without allocating or raising, and still end up
+    skipping any with block they are used in. Dunder lookups keep VoidType's
+    None, so protocol probes by other libraries are not fooled.
+
+    The first lookup of a name goes through __getattr__, which stores the
+    instance on the class under that name; every later lookup of the name is
+    then an ordinary (cached) class attribute hit.
+    """
+
+    __slots__ = ()
+
+    __getattribute__ = object.__getattribute__
+
+    def __getattr__(self, attr):
+        if attr[:2] == '__' and attr[-2:] == '__':
+            if attr in _ARRAY_PROBES:
+                raise AttributeError(attr)
+            return None
+        cls = type(self)
+        if len(vars(cls)) < _MAX_STUBS:
+            setattr(cls, attr, self)
+        return self
+
+    def __call__(self, *args, **kwds):
+        return self
+
+    def __getitem__(self, key):
+        return self
+
+    # the generator methods VoidType defines are absorbed as well, so that
+    # `stream.send(x).close()` is a chain like any other
+    send = throw = close = asend = athrow = aclose = __call__
+
+    def __reduce__(self):
+        return 'AbsorbingVoid'
+
+
+AbsorbingVoid = AbsorbingVoidType()
+
+
+# null contexts whose block runs
+
+class PassThroughVoidType(VoidType):
+    """Absorbing VoidType whose with blocks run instead of being skipped
+
+    Stands in for disabled tracing spans, locks and transactions, where the
+    body has to run: `with tracer.start_span('x') as span:` runs the block
+    with span being the instance itself, so span.set_attribute() and nested
+    spans are absorbed as on AbsorbingVoid. Entering and exiting, with or
+    async with, allocates nothing and raises nothing, and exceptions from
+    the block propagate as through contextlib.nullcontext(). As a lock it is
+    always free: acquire() is True and locked() is False.
+    """
+
+    __slots__ = ()
+
+    # absorb like AbsorbingVoidType, without inheriting the names it cached
+    __getattribute__ = object.__getattribute__
+    __getattr__ = AbsorbingVoidType.__getattr__
+    __call__ = AbsorbingVoidType.__call__
+    __getitem__ = AbsorbingVoidType.__getitem__
+    send = throw = close = AbsorbingVoidType.__call__
+    asend = athrow = aclose = AbsorbingVoidType.__call__
+
+    def __reduce__(self):
+        return 'PassThroughVoid'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, etype, e, trace):
+        pass
+
+    def __aenter__(self):
+        if _passed_in is None:
+            _prepare_async()
+        return _passed_in
+
+    def __aexit__(self, etype, e, trace):
+        if _passed_out is None:
+            _prepare_async()
+        return _passed_out
+
+    def acquire(self, blocking=True, timeout=-1):
+        return True
+
+    def release(self):
+        pass
+
+    def locked(self):
+        return False
+
+
+PassThroughVoid = PassThroughVoidType()
+
+if _free_threaded():
+    PassThroughVoidType.__aenter__ = _pass_in_per_thread
+    PassThroughVoidType.__aexit__ = _pass_out_per_thread
+
+
+# null files and sockets
+
+class VoidIO(VoidType):
+    """File and socket lookalike that makes no system calls
+
+    Writes and sends report every byte as written, without copying or even
+    looking at the data, and reads are at EOF straight away, leaving any
+    buffer passed to readinto() untouched. It accepts str as well as
+    bytes-like data, so it can replace sys.stdout (it is its own .buffer)
+    or be wrapped in io.BufferedWriter or io.TextIOWrapper. Unlike Void it
+    runs the body of a with block, and using it once closed raises
+    ValueError like any other file. Unlike Void, it does not make up
+    attributes it does not have, so hasattr() probes answer truthfully;
+    setting attributes is still ignored.
+    """
+
+    __slots__ = ('closed',)
+
+    __getattribute__ = object.__getattribute__
+
+    def __init__(self):
+        object.__setattr__(self, 'closed', False)
+
+    def __repr__(self):
+        return '<VoidIO>'
+
+    # unlike the singletons, every copy is a new (open) sink
+
+    def __reduce__(self):
+        return type(self), ()
+
+    def __copy__(self):
+        return type(self)()
+
+    def __deepcopy__(self, memo):
+        return type(self)()
+
+    def __enter__(self):
+        self._check_closed()
+        return self
+
+    def __exit__(self, etype, e, trace):
+        object.__setattr__(self, 'closed', True)
+
+    def _check_closed(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+
+    name = '<void>'
+    mode = 'rb+'
+    encoding = 'utf-8'
+    errors = 'strict'
+    newlines = None
+    line_buffering = False
+
+    @property
+    def buffer(self):
+        return self
+
+    @property
+    def raw(self):
+        return self
+
+    def close(self):
+        object.__setattr__(self, 'closed', True)
+
+    def fileno(self):
+        raise io.UnsupportedOperation('fileno')
+
+    def isatty(self):
+        self._check_closed()
+        return False
+
+    def readable(self):
+        self._check_closed()
+        return True
+
+    def writable(self):
+        self._check_closed()
+        return True
+
+    def seekable(self):
+        self._check_closed()
+        return True
+
+    def seek(self, pos, whence=0):
+        self._check_closed()
+        return 0
+
+    def tell(self):
+        self._check_closed()
+        return 0
+
+    def truncate(self, size=None):
+        self._check_closed()
+        return 0
+
+    def flush(self):
+        self._check_closed()
+
+    def write(self, b):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+        cls = type(b)
+        if cls is bytes or cls is str or cls is bytearray:
+            return len(b)
+        with memoryview(b) as view:
+            return view.nbytes
+
+    send = write
+
+    def sendto(self, data, flags_or_address, address=None):
+        return self.write(data)
+
+    def sendall(self, data, flags=0):
+        self.write(data)
+
+    def sendfile(self, file, offset=0, count=None):
+        """Count the bytes of file from offset on, seeking past them
+
+        The size is found by seeking to the end, so nothing is read.
+        """
+        self._check_closed()
+        sent = max(file.seek(0, 2) - offset, 0)
+        if count is not None:
+            sent = min(sent, count)
+        file.seek(offset + sent)
+        return sent
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def read(self, size=-1):
+        self._check_closed()
+        return b''
+
+    readall = read
+    readline = read
+    read1 = read
+
+    def readlines(self, hint=-1):
+        self._check_closed()
+        return []
+
+    def readinto(self, b):
+        self._check_closed()
+        return 0
+
+    readinto1 = readinto
+
+    def recv(self, bufsize, flags=0):
+        self._check_closed()
+        return b''
+
+    def recv_into(self, buffer, nbytes=0, flags=0):
+        self._check_closed()
+        return 0
+
+    def recvfrom(self, bufsize, flags=0):
+        self._check_closed()
+        return b'', None
+
+    def shutdown(self, how):
+        pass
+
+    def setblocking(self, flag):
+        pass
+
+    def settimeout(self, value):
+        pass
+
+    def gettimeout(self):
+        return None
+
+
+io.RawIOBase.register(VoidIO)
+
+
+# recording operations to replay later
+
+_CALL, _SETATTR, _DELATTR, _SETITEM, _DELITEM = range(5)
+_OPERATIONS = ('call', 'setattr', 'delattr', 'setitem', 'delitem')
+
+
+class Recorder(object):
+    """Bounded ring buffer of operations done to its `void`, for replay
+
+    `recorder.void` behaves like Void to its callers, but method calls on
+    it, calls of it and attribute and item assignments and deletions are
+    recorded; attribute reads, comparisons and the rest are not, and with
+    blocks are still skipped. Once the real backend is there, replay()
+    does everything recorded to it, in order.
+
+    The buffer holds at most `capacity` operations in preallocated parallel
+    lists, storing only the argument tuples the calls were made with. When
+    it is full, the policy 'drop-oldest' overwrites the oldest operation and
+    'drop-newest' ignores the new one; either way `dropped` is counted up.
+    """
+
+    __slots__ = ('capacity', 'policy', 'dropped', 'void', '_kinds',
+                 '_names', '_args', '_kwds', '_start', '_count', '_lock')
+
+    def __init__(self, capacity=1024, policy='drop-oldest'):
+        import array
+        import threading
+
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        if policy not in ('drop-oldest', 'drop-newest'):
+            raise ValueError('policy must be drop-oldest or drop-newest')
+        self.capacity = capacity
+        self.policy = policy
+        self.dropped = 0
+        self._kinds = array.array('B', bytes(capacity))
+        self._names = [None] * capacity
+        self._args = [None] * capacity
+        self._kwds = [None] * capacity
+        self._start = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        # a class of its own to keep the method stubs on (see __getattr__)
+        cls = type('RecordingVoidType', (RecordingVoidType,),
+                   {'__slots__': ()})
+        self.void = cls(self)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """(operation, name or key, args, kwds) for each pending operation"""
+        for kind, name, args, kwds in zip(*self._snapshot(clear=False)):
+            yield _OPERATIONS[kind], name, args, kwds or {}
+
+    def __repr__(self):
+        return '<Recorder {0}/{1} pending, {2} dropped>'.format(
+            self._count, self.capacity, self.dropped)
+
+    def _record(self, kind, name, args, kwds):
+        # acquire()/release() rather than with, which costs twice as much
+        lock = self._lock
+        lock.acquire()
+        try:
+            count = self._count
+            capacity = self.capacity
+            if count == capacity:
+                self.dropped += 1
+                if self.policy == 'drop-newest':
+                    return
+                index = self._start
+                self._start = (index + 1) % capacity
+            else:
+                index = (self._start + count) % capacity
+                self._count = count + 1
+            self._kinds[index] = kind
+            self._names[index] = name
+            self._args[index] = args
+            self._kwds[index] = kwds or None
+        finally:
+            lock.release()
+
+    def _snapshot(self, clear):
+        """The pending operations as four lists, oldest first"""
+        with self._lock:
+            start, end = self._start, self._start + self._count
+            lists = []
+            for column in (self._kinds, self._names, self._args, self._kwds):
+                rotated = list(column[start:end])
+                if end > self.capacity:
+                    rotated.extend(column[:end - self.capacity])
+                lists.append(rotated)
+            if clear:
+                self._clear()
+        return lists
+
+    def _clear(self):
+        for column in (self._names, self._args, self._kwds):
+            column[:] = [None] * self.capacity
+        self._start = self._count = 0
+
+    def clear(self):
+        """Forget every pending operation"""
+        with self._lock:
+            self._clear()
+
+    def replay(self, backend):
+        """Do every pending operation to backend, returning how many
+
+        The buffer is emptied first, so anything recorded meanwhile waits
+        for the next replay. Method lookups are cached for the duration.
+        If an operation raises, it and the ones after it are put back in
+        front of anything recorded since (as far as capacity allows), and
+        the exception propagates.
+        """
+        kinds, names, argses, kwdses = self._snapshot(clear=True)
+        methods = {}
+        done = 0
+        try:
+            for kind, name, args, kwds in zip(kinds, names, argses, kwdses):
+                if kind == _CALL:
+                    if name is None:
+                        method = backend
+                    else:
+                        method = methods.get(name)
+                        if method is None:
+                            method = methods[name] = getattr(backend, name)
+                    if kwds:
+                        method(*args, **kwds)
+                    else:
+                        method(*args)
+                elif kind == _SETATTR:
+                    setattr(backend, name, args[0])
+                elif kind == _SETITEM:
+                    backend[name] = args[0]
+                elif kind == _DELATTR:
+                    delattr(backend, name)
+                else:
+                    del backend[name]
+                done += 1
+        except BaseException:
+            self._restore(kinds[done:], names[done:], argses[done:],
+                          kwdses[done:])
+            raise
+        return done
+
+    def _restore(self, *unreplayed):
+        later = self._snapshot(clear=True)
+        for lists in (unreplayed, later):
+            for operation in zip(*lists):
+                self._record(*operation)
+
+
+class RecordingVoidType(VoidType):
+    """The VoidType handed out as Recorder.void
+
+    Each recorder gets a subclass of its own, where the first lookup of a
+    method name stores a recording stub, as AbsorbingVoidType does, so later
+    lookups are plain class attribute hits.
+    """
+
+    __slots__ = ('_void_recorder',)
+
+    __getattribute__ = object.__getattribute__
+
+    def __init__(self, recorder):
+        object.__setattr__(self, '_void_recorder', recorder)
+
+    def __getattr__(self, attr):
+        if attr[:2] == '__' and attr[-2:] == '__':
+            if attr in _ARRAY_PROBES:
+                raise AttributeError(attr)
+            return None
+        method = _RecordedMethod(self._void_recorder, attr)
+        cls = type(self)
+        if len(vars(cls)) < _MAX_STUBS:
+            setattr(cls, attr, method)
+        return method
+
+    def __call__(self, *args, **kwds):
+        self._void_recorder._record(_CALL, None, args, kwds)
+
+    def __setattr__(self, attr, value):
+        self._void_recorder._record(_SETATTR, attr, (value,), None)
+
+    def __delattr__(self, attr):
+        self._void_recorder._record(_DELATTR, attr, (), None)
+
+    def __setitem__(self, key, value):
+        self._void_recorder._record(_SETITEM, key, (value,), None)
+
+    def __delitem__(self, key):
+        self._void_recorder._record(_DELITEM, key, (), None)
+
+    def __reduce__(self):
+        raise TypeError('cannot pickle a recording Void')
+
+
+class _RecordedMethod(VoidType):
+    """A method of a RecordingVoidType, recording its calls"""
+
+    __slots__ = ('_void_recorder', '_void_name')
+
+    __getattribute__ = object.__getattribute__
+
+    def __init__(self, recorder, name):
+        object.__setattr__(self, '_void_recorder', recorder)
+        object.__setattr__(self, '_void_name', name)
+
+    def __call__(self, *args, **kwds):
+        self._void_recorder._record(_CALL, self._void_name, args, kwds)
+
+    def __reduce__(self):
+        raise TypeError('cannot pickle a method of a recording Void')
+
+
+# degrading a slow or failing backend to Void
+
+class CircuitBreaker(object):
+    """Guards a backend, turning it into AbsorbingVoid while it misbehaves
+
+    Calls go through `breaker.proxy`, which forwards attribute lookups and
+    method calls to `backend` and times each method call. Every method keeps
+    a streaming estimate of its `quantile` latency (see _GuardedMethod) and
+    a decaying error rate. Once a method was called `min_calls` times and its
+    estimate goes above `latency` seconds, or its error rate above
+    `error_rate`, the breaker opens: from then on the proxy
+    answers every lookup and call with AbsorbingVoid, whose with blocks are
+    skipped, without touching the backend at all.
+
+    After `cooldown` seconds it goes half-open and lets calls through again
+    as probes; `probes` fast, successful ones in a row close it (with fresh
+    estimates), while one slow or failing probe opens it for another
+    cooldown. trip() and reset() force it open or closed.
+    """
+
+    def __init__(self, backend, latency=0.1, quantile=0.99, error_rate=0.5,
+                 min_calls=20, cooldown=5.0, probes=3, adapt=0.05):
+        import threading
+        import time
+
+        if not 0 < quantile < 1:
+            raise ValueError('quantile must be between 0 and 1')
+        self.backend = backend
+        self.latency = latency
+        self.quantile = quantile
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.probes = probes
+        self.state = 'closed'
+        self._decay = 1 - adapt
+        self._up = 1 + adapt * quantile
+        self._down = 1 - adapt * (1 - quantile)
+        self._clock = time.perf_counter
+        self._monotonic = time.monotonic
+        self._retry_at = 0.0
+        self._passed = 0
+        self._methods = {}
+        self._local = threading.local()
+        # a class of its own to keep the guarded methods on
+        cls = type('CircuitBreakerProxy', (_BreakerProxy,), {'__slots__': ()})
+        self.proxy = cls(self)
+
+    def __repr__(self):
+        return '<CircuitBreaker {0} {1!r}>'.format(self.state, self.backend)
+
+    def estimates(self):
+        """The current latency estimate of each method called so far"""
+        return {name: method._estimate
+                for name, method in self._methods.items()}
+
+    def error_rates(self):
+        """The current error rate of each method called so far"""
+        return {name: method._error_rate()
+                for name, method in self._methods.items()}
+
+    def trip(self):
+        """Open the breaker for one cooldown"""
+        self.state = 'open'
+        self._retry_at = self._monotonic() + self.cooldown
+
+    def reset(self):
+        """Close the breaker, forgetting all latencies and errors"""
+        for method in self._methods.values():
+            method._estimate = 0.0
+            method._calls = method._failed_at = 0
+            method._errors = 0.0
+        self.state = 'closed'
+
+    def _allow(self):
+        """Whether a call may go to the backend while not closed"""
+        if self.state == 'open':
+            if self._monotonic() < self._retry_at:
+                return False
+            self.state = 'half-open'
+            self._passed = 0
+        return True
+
+    def _blocks(self):
+        """This thread's open with blocks, True for each one absorbed"""
+        try:
+            return self._local.blocks
+        except AttributeError:
+            blocks = self._local.blocks = []
+            return blocks
+
+    def _probed(self, ok):
+        if not ok:
+            self.trip()
+            return
+        self._passed += 1
+        if self._passed >= self.probes:
+            self.reset()
+
+    def _failed(self, method):
+        decay = self._decay
+        method._errors = (method._errors *
+                          decay ** (method._calls - method._failed_at) *
+                          decay + 1 - decay)
+        method._calls += 1
+        method._failed_at = method._calls
+        errors = method._error_rate()
+        if self.state == 'half-open':
+            self._probed(False)
+        elif errors > self.error_rate and method._calls >= self.min_calls:
+            self.trip()
+
+
+class _GuardedMethod(object):
+    """A method of a CircuitBreaker's proxy, timing each call
+
+    The latency estimate is moved up by a factor of 1 + adapt * quantile for
+    every call slower than it and down by 1 - adapt * (1 - quantile) for
+    every faster one, which settles where `quantile` of the calls are
+    faster: a quantile estimate in two float operations and no memory.
+    The error rate only changes on failures, decayed by the number of calls
+    since the previous one, so successful calls never touch it.
+    """
+
+    __slots__ = ('_breaker', '_target', '_estimate', '_calls', '_errors',
+                 '_failed_at')
+
+    def __init__(self, breaker, target):
+        self._breaker = breaker
+        self._target = target
+        self._estimate = 0.0
+        self._calls = self._failed_at = 0
+        self._errors = 0.0
+
+    def _error_rate(self):
+        if not self._calls:
+            return 0.0
+        decay = self._breaker._decay
+        # corrected for starting at zero, so early failures count in full
+        return (self._errors * decay ** (self._calls - self._failed_at) /
+                (1 - decay ** self._calls))
+
+    def __call__(self, *args, **kwds):
+        breaker = self._breaker
+        if breaker.state != 'closed' and not breaker._allow():
+            return AbsorbingVoid
+        clock = breaker._clock
+        start = clock()
+        try:
+            result = self._target(*args, **kwds)
+        except Exception:
+            breaker._failed(self)
+            raise
+        elapsed = clock() - start
+
+        estimate = self._estimate
+        if elapsed > estimate:
+            estimate = estimate * breaker._up if estimate else elapsed
+        else:
+            estimate *= breaker._down
+        self._estimate = estimate
+        self._calls += 1
+        if breaker.state != 'closed':
+            breaker._probed(elapsed <= breaker.latency)
+        elif estimate > breaker.latency and self._calls >= breaker.min_calls:
+            breaker.trip()
+        return result
+
+
+class _BreakerProxy(object):
+    """Base of the proxy classes of CircuitBreakers
+
+    Methods of the backend are looked up on it once and then kept, bound,
+    on the class as _GuardedMethods; any other attribute is forwarded on every
+    lookup. With blocks on the proxy go to the backend, or are skipped.
+    """
+
+    __slots__ = ('_void_breaker',)
+
+    def __init__(self, breaker):
+        self._void_breaker = breaker
+
+    def __getattr__(self, attr):
+        breaker = self._void_breaker
+        if breaker.state != 'closed' and not breaker._allow():
+            return AbsorbingVoid
+        value = getattr(breaker.backend, attr)
+        if not callable(value) or attr[:2] == '__':
+            return value
+        method = breaker._methods[attr] = _GuardedMethod(breaker, value)
+        cls = type(self)
+        if len(vars(cls)) < _MAX_STUBS:
+            setattr(cls, attr, method)
+        return method
+
+    def __enter__(self):
+        breaker = self._void_breaker
+        absorbed = breaker.state != 'closed' and not breaker._allow()
+        blocks = breaker._blocks()
+        if absorbed:
+            blocks.append(True)
+            return AbsorbingVoid.__enter__()
+        context = breaker.backend.__enter__()
+        blocks.append(False)
+        return context
+
+    def __exit__(self, etype, e, trace):
+        # exit the way the block was entered, whatever the state is now
+        breaker = self._void_breaker
+        if breaker._blocks().pop():
+            return AbsorbingVoid.__exit__(etype, e, trace)
+        return breaker.backend.__exit__(etype, e, trace)
+
+
+# forwarding only a sample of the calls on a backend
+
+class Sampler(object):
+    """Forwards some of the calls on a backend and Voids the rest
+
+    Calls go through `sampler.proxy` like through a CircuitBreaker's, but
+    each method call, and each with block, is decided on its own: it goes to
+    the backend with probability `fraction` and, with a `limit`, only while
+    fewer than `limit` calls went through in the current `period` seconds.
+    Anything else is a call on Void instead, and a skipped with block as on
+    Void; `dropped` counts them.
+
+    Nothing is locked: every thread samples from a Random of its own and
+    counts its own drops, summed when read, and the limit is a counter per
+    period swapped in whole, which may let a few calls more through when
+    threads race at the turn of a period. Only a thread's first call, its
+    end and reading `dropped` lock: an ended thread's count is folded into
+    a total, so that threads started per request do not pile up.
+    """
+
+    def __init__(self, backend, fraction=1.0, limit=None, period=1.0):
+        import threading
+        import time
+
+        if not 0 <= fraction <= 1:
+            raise ValueError('fraction must be between 0 and 1')
+        if limit is not None and limit < 0:
+            raise ValueError('limit must not be negative')
+        self.backend = backend
+        self.fraction = fraction
+        self.limit = limit
+        self.period = period
+        self._clock = time.monotonic
+        self._window = (None, None)
+        self._local = threading.local()
+        self._threads = set()
+        self._retired = [0]
+        self._retire_lock = threading.Lock()
+        cls = type('SamplerProxy', (_SamplerProxy,), {'__slots__': ()})
+        self.proxy = cls(self)
+
+    def __repr__(self):
+        return '<Sampler {0} {1!r}>'.format(self.fraction, self.backend)
+
+    @property
+    def dropped(self):
+        """How many calls and with blocks were Voided so far"""
+        with self._retire_lock:
+            return self._retired[0] + sum(thread.dropped
+                                          for thread in self._threads)
+
+    def _thread(self):
+        try:
+            return self._local.thread
+        except AttributeError:
+            import random
+            import weakref
+
+            thread = self._local.thread = _SamplerThread(random.Random())
+            with self._retire_lock:
+                self._threads.add(thread)
+            # the local's entries are dropped when the thread ends, and
+            # with them this marker, so that the thread is retired then
+            marker = self._local.marker = _SamplerThreadEnd()
+            weakref.finalize(marker, _retire_sampler_thread, self._threads,
+                             self._retired, self._retire_lock, thread)
+            return thread
+
+    def _admit(self, thread):
+        """Whether the next call or with block goes to the backend"""
+        if self.fraction < 1 and thread.random() >= self.fraction:
+            thread.dropped += 1
+            return False
+        if self.limit is not None:
+            window = self._clock() // self.period
+            current, counter = self._window
+            if current != window:
+                import itertools
+
+                counter = itertools.count()
+                self._window = (window, counter)
+            if next(counter) >= self.limit:
+                thread.dropped += 1
+                return False
+        return True
+
+
+class _SamplerThread(object):
+    """The state a Sampler keeps for each thread"""
+
+    __slots__ = ('random', 'dropped', 'blocks')
+
+    def __init__(self, random):
+        self.random = random.random
+        self.dropped = 0
+        self.blocks = []
+
+
+class _SamplerThreadEnd(object):
+    """Held only by a Sampler's thread-local, to notice the thread ending"""
+
+    __slots__ = ('__weakref__',)
+
+
+def _retire_sampler_thread(threads, retired, lock, thread):
+    """Fold the count of an ended thread into its Sampler's total"""
+    with lock:
+        retired[0] += thread.dropped
+        threads.discard(thread)
+
+
+class _SampledMethod(object):
+    """A method of a Sampler's proxy, forwarding only admitted calls"""
+
+    __slots__ = ('_sampler', '_target')
+
+    def __init__(self, sampler, target):
+        self._sampler = sampler
+        self._target = target
+
+    def __call__(self, *args, **kwds):
+        sampler = self._sampler
+        try:
+            thread = sampler._local.thread
+        except AttributeError:
+            thread = sampler._thread()
+        if sampler._admit(thread):
+            return self._target(*args, **kwds)
+        return Void(*args, **kwds)
+
+
+class _SamplerProxy(object):
+    """Base of the proxy classes of Samplers, see _BreakerProxy"""
+
+    __slots__ = ('_void_sampler',)
+
+    def __init__(self, sampler):
+        self._void_sampler = sampler
+
+    def __getattr__(self, attr):
+        sampler = self._void_sampler
+        value = getattr(sampler.backend, attr)
+        if not callable(value) or attr[:2] == '__':
+            return value
+        method = _SampledMethod(sampler, value)
+        cls = type(self)
+        if len(vars(cls)) < _MAX_STUBS:
+            setattr(cls, attr, method)
+        return method
+
+    def __enter__(self):
+        sampler = self._void_sampler
+        thread = sampler._thread()
+        if not sampler._admit(thread):
+            thread.blocks.append(True)
+            return Void.__enter__()
+        context = sampler.backend.__enter__()
+        thread.blocks.append(False)
+        return context
+
+    def __exit__(self, etype, e, trace):
+        sampler = self._void_sampler
+        if sampler._thread().blocks.pop():
+            return Void.__exit__(etype, e, trace)
+        return sampler.backend.__exit__(etype, e, trace)
+
+
+# standing in for disabled modules without importing them
+
+_disabled_modules = set()
+
+
+class VoidModule(type(sys)):
+    """A module standing in for a disabled one; its attributes are Void
+
+    Every attribute it does not have is AbsorbingVoid, so `from x import y`
+    and chains like `x.get_client().send()` do nothing successfully. Dunder
+    names are still missing, as tools probe modules for them.
+    """
+
+    def __repr__(self):
+        return '<VoidModule {0!r}>'.format(self.__name__)
+
+    def __getattr__(self, attr):
+        if attr[:2] == '__':
+            raise AttributeError(attr)
+        return AbsorbingVoid
+
+
+class _VoidImporter(object):
+    """The sys.meta_path finder and loader of VoidModules"""
+
+    @staticmethod
+    def find_spec(fullname, path=None, target=None):
+        name = fullname
+        while name not in _disabled_modules:
+            name, dot, _ = name.rpartition('.')
+            if not dot:
+                return None
+        # ModuleSpec, without importing importlib for it
+        spec_type = type(sys.__spec__)
+        return spec_type(fullname, _VoidImporter, is_package=True)
+
+    @staticmethod
+    def create_module(spec):
+        return VoidModule(spec.name)
+
+    @staticmethod
+    def exec_module(module):
+        pass
+
+
+def disable_modules(*names):
+    """Import VoidModules in place of the named modules from now on
+
+    Submodules of the names are disabled along with them. Modules imported
+    already stay as they are, so call this before anything imports them;
+    setting VOID_MODULES to a comma separated list of names does this when
+    void is imported.
+    """
+    _disabled_modules.update(names)
+    if _VoidImporter not in sys.meta_path:
+        sys.meta_path.insert(0, _VoidImporter)
+
+
+def enable_modules(*names):
+    """Import the named modules normally again
+
+    VoidModules imported for them before are dropped from sys.modules, so
+    the next import gets the real module; references held elsewhere stay.
+    """
+    _disabled_modules.difference_update(names)
+    for fullname, module in list(sys.modules.items()):
+        if isinstance(module, VoidModule) and not _VoidImporter.find_spec(
+                fullname):
+            del sys.modules[fullname]
+    if not _disabled_modules and _VoidImporter in sys.meta_path:
+        sys.meta_path.remove(_VoidImporter)
+
+
+def _disable_from_environment():
+    import os
+
+    names = [name.strip() for name in
+             os.environ.get('VOID_MODULES', '').split(',') if name.strip()]
+    if names:
+        disable_modules(*names)
+
+
+_disable_from_environment()
+
+
+# asyncio scheduling helpers that skip Void
+
+def _finished(loop, result=None):
+    """A future finished with result, shared by callers on one loop
+
+    The futures are kept on the loop itself, so no loop is ever handed one
+    of another's, even with loops running in several threads, and they go
+    away with it; a cache anywhere else would keep the loop alive, as the
+    futures refer to it. Loops that take no attributes get a new future
+    every time. Results must be hashable.
+    """
+    try:
+        return loop._void_finished[result]
+    except AttributeError:
+        futures = {}
+        try:
+            loop._void_finished = futures
+        except AttributeError:
+            futures = None
+    except KeyError:
+        futures = loop._void_finished
+    future = loop.create_future()
+    future.set_result(result)
+    if futures is not None:
+        futures[result] = future
+    return future
+
+
+def gather(*aws, return_exceptions=False):
+    """asyncio.gather() that resolves Void awaitables inline
+
+    Void entries get None in the results without ever becoming tasks; when
+    every entry is Void the result is an already finished future and nothing
+    is scheduled on the loop at all. Everything else goes through
+    asyncio.gather() as usual, and cancelling the result cancels that.
+    """
+    import asyncio
+
+    real = [aw for aw in aws if not isinstance(aw, VoidType)]
+    if len(real) == len(aws):
+        return asyncio.gather(*aws, return_exceptions=return_exceptions)
+    outer = asyncio.get_running_loop().create_future()
+    if not real:
+        outer.set_result([None] * len(aws))
+        return outer
+
+    inner = asyncio.gather(*real, return_exceptions=return_exceptions)
+
+    def merge(inner):
+        if outer.done():
+            # mark any exception retrieved, or collecting inner logs it
+            if not inner.cancelled():
+                inner.exception()
+            return
+        if inner.cancelled():
+            outer.cancel()
+        elif inner.exception() is not None:
+            outer.set_exception(inner.exception())
+        else:
+            results = iter(inner.result())
+            outer.set_result([None if isinstance(aw, VoidType)
+                              else next(results) for aw in aws])
+
+    def cancel(outer):
+        if outer.cancelled():
+            inner.cancel()
+
+    inner.add_done_callback(merge)
+    outer.add_done_callback(cancel)
+    return outer
+
+
+def ensure_future(aw, *, loop=None):
+    """asyncio.ensure_future() returning a shared finished future for Void"""
+    import asyncio
+
+    if isinstance(aw, VoidType):
+        return _finished(loop or asyncio.get_running_loop())
+    return asyncio.ensure_future(aw, loop=loop)
+
+
+def create_task(coro, **kwds):
+    """asyncio.create_task() that also accepts Void, without making a task"""
+    import asyncio
+
+    if isinstance(coro, VoidType):
+        return _finished(asyncio.get_running_loop())
+    return asyncio.create_task(coro, **kwds)
+
+
+def wait_for(aw, timeout):
+    """asyncio.wait_for() that hands back Void itself for Void
+
+    Awaiting Void finishes immediately with None, so there is no timeout to
+    arm and no task to wrap it in.
+    """
+    import asyncio
+
+    if isinstance(aw, VoidType):
+        return aw
+    return asyncio.wait_for(aw, timeout)
+
+
+# classes built on heavier standard library modules are only created when
+# first accessed (PEP 562), so that importing void stays cheap
+
+_lazy_attributes = {}
+
+
+def __getattr__(name):
+    try:
+        build = _lazy_attributes[name]
+    except KeyError:
+        raise AttributeError('module {0!r} has no attribute {1!r}'.format(
+            __name__, name)) from None
+    value = globals()[name] = build()
+    return value
+
+
+def _discard(*args):
+    pass
+
+
+# null executors
+
+def _build_executor():
+    import concurrent.futures
+
+    class FinishedFuture(concurrent.futures.Future):
+        """A future finished with None that answers without taking its lock"""
+
+        def cancel(self):
+            return False
+
+        def cancelled(self):
+            return False
+
+        def running(self):
+            return False
+
+        def done(self):
+            return True
+
+        def result(self, timeout=None):
+            return None
+
+        def exception(self, timeout=None):
+            return None
+
+    finished = FinishedFuture()
+    finished.set_result(None)
+
+    class VoidExecutor(concurrent.futures.Executor):
+        """concurrent.futures.Executor that never runs anything
+
+        submit() returns one shared future that is already finished with
+        None, and map() yields None per input, only drawing from the
+        iterables as its results are consumed. No thread or process is ever
+        started, so shutdown() has nothing to wait for; as a context manager
+        it runs its block like any other executor.
+        """
+
+        def submit(self, fn, /, *args, **kwargs):
+            return finished
+
+        def map(self, fn, *iterables, timeout=None, chunksize=1):
+            return map(_discard, *iterables)
+
+        def shutdown(self, wait=True, *, cancel_futures=False):
+            pass
+
+    VoidExecutor.__module__ = __name__
+    VoidExecutor.__qualname__ = 'VoidExecutor'
+    return VoidExecutor
+
+
+_lazy_attributes['VoidExecutor'] = _build_executor
+
+
+class _VoidResult(object):
+    """multiprocessing AsyncResult lookalike that is ready from the start
+
+    Results for a whole iterable are only drawn from it by the first get().
+    """
+
+    __slots__ = ('_iterable',)
+
+    def __init__(self, iterable=None):
+        self._iterable = iterable
+
+    def ready(self):
+        return True
+
+    def successful(self):
+        return True
+
+    def wait(self, timeout=None):
+        pass
+
+    def get(self, timeout=None):
+        if self._iterable is None:
+            return None
+        if not isinstance(self._iterable, list):
+            self._iterable = [None for _ in self._iterable]
+        return list(self._iterable)
+
+
+_void_result = _VoidResult()
+
+
+class VoidPool(object):
+    """multiprocessing.Pool lookalike that never runs anything
+
+    apply() returns None and apply_async() one shared, already ready result.
+    The map family returns None per input: map() and starmap() as lists,
+    imap() lazily, and map_async() only consuming the iterable when its
+    result is asked for. Callbacks are called straight away. No process is
+    ever started, and the pool runs its block as a context manager.
+    """
+
+    __slots__ = ('__weakref__',)
+
+    def __init__(self, processes=None, *args, **kwds):
+        pass
+
+    def apply(self, func, args=(), kwds={}):
+        pass
+
+    def apply_async(self, func, args=(), kwds={}, callback=None,
+                    error_callback=None):
+        if callback is not None:
+            callback(None)
+        return _void_result
+
+    def map(self, func, iterable, chunksize=None):
+        return [None for _ in iterable]
+
+    def starmap(self, func, iterable, chunksize=None):
+        return [None for _ in iterable]
+
+    def map_async(self, func, iterable, chunksize=None, callback=None,
+                  error_callback=None):
+        result = _VoidResult(iterable)
+        if callback is not None:
+            callback(result.get())
+        return result
+
+    starmap_async = map_async
+
+    def imap(self, func, iterable, chunksize=1):
+        return map(_discard, iterable)
+
+    imap_unordered = imap
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        pass
+
+    def join(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, etype, e, trace):
+        pass
+
+
+# null asyncio streams
+
+_streams = None
+
+
+def _build_streams():
+    global _streams
+    if _streams is not None:
+        return _streams
+    import asyncio
+
+    get_running_loop = asyncio.get_running_loop
+    buffers = (bytes, bytearray, memoryview)
+
+    def check(data):
+        # the same bytes-like check real transports make, without copying
+        if type(data) not in buffers:
+            try:
+                memoryview(data).release()
+            except TypeError:
+                raise TypeError('data argument must be a bytes-like object, '
+                                'not {0!r}'.format(type(data).__name__)) from None
+
+    class VoidTransport(asyncio.Transport):
+        """asyncio.Transport that discards everything written to it
+
+        Writes are checked to be bytes-like but never copied or buffered, so
+        the write buffer is always empty and flow control never kicks in.
+        Closing it tells its protocol, if any, that the connection is lost.
+        """
+
+        __slots__ = ('_protocol', '_closing')
+
+        def __init__(self, extra=None, protocol=None):
+            super().__init__(extra)
+            self._protocol = protocol
+            self._closing = False
+
+        def write(self, data):
+            check(data)
+
+        def writelines(self, list_of_data):
+            for data in list_of_data:
+                check(data)
+
+        def write_eof(self):
+            pass
+
+        def can_write_eof(self):
+            return True
+
+        def get_write_buffer_size(self):
+            return 0
+
+        def get_write_buffer_limits(self):
+            return (0, 0)
+
+        def set_write_buffer_limits(self, high=None, low=None):
+            pass
+
+        def is_reading(self):
+            return not self._closing
+
+        def pause_reading(self):
+            pass
+
+        def resume_reading(self):
+            pass
+
+        def set_protocol(self, protocol):
+            self._protocol = protocol
+
+        def get_protocol(self):
+            return self._protocol
+
+        def is_closing(self):
+            return self._closing
+
+        def close(self):
+            if not self._closing:
+                self._closing = True
+                if self._protocol is not None:
+                    self._protocol.connection_lost(None)
+
+        abort = close
+
+    class VoidProtocol(asyncio.BufferedProtocol):
+        """asyncio protocol that accepts and drops whatever it receives
+
+        As a buffered protocol it hands the transport one shared scratch
+        buffer to read into, so incoming data is never copied into new
+        objects; data_received() is also there for plain transports.
+        """
+
+        __slots__ = ()
+
+        scratch = memoryview(bytearray(65536))
+
+        def get_buffer(self, sizehint):
+            return self.scratch
+
+        def buffer_updated(self, nbytes):
+            pass
+
+        def data_received(self, data):
+            pass
+
+    class VoidStreamReader(asyncio.StreamReader):
+        """asyncio.StreamReader that is at EOF from the start
+
+        read() and readline() finish with b'' right away, async iteration
+        stops at once, and readexactly()/readuntil() raise
+        IncompleteReadError just like a real reader at EOF. Anything fed to
+        it is dropped.
+        """
+
+        def __init__(self, limit=2 ** 16, loop=None):
+            self._limit = limit
+            self._transport = None
+
+        def __repr__(self):
+            return '<VoidStreamReader eof>'
+
+        def exception(self):
+            return None
+
+        def set_exception(self, exc):
+            pass
+
+        def set_transport(self, transport):
+            self._transport = transport
+
+        def feed_eof(self):
+            pass
+
+        def feed_data(self, data):
+            pass
+
+        def at_eof(self):
+            return True
+
+        def read(self, n=-1):
+            return _finished(get_running_loop(), b'')
+
+        readline = read
+
+        def readexactly(self, n):
+            if n < 0:
+                raise ValueError('readexactly size can not be less than zero')
+            if n == 0:
+                return self.read()
+            return self._incomplete(n)
+
+        def readuntil(self, separator=b'\n'):
+            if not separator:
+                raise ValueError('Separator should be at least one-byte string')
+            return self._incomplete(None)
+
+        async def _incomplete(self, expected):
+            raise asyncio.IncompleteReadError(b'', expected)
+
+        def __aiter__(self):
+            return self
+
+        __anext__ = VoidType.__anext__
+
+    class VoidStreamWriter(asyncio.StreamWriter):
+        """asyncio.StreamWriter over a VoidTransport
+
+        write() and writelines() take bytes-like data without copying it,
+        and drain() and wait_closed() hand back a finished future shared on
+        the running loop, so awaiting them never suspends.
+        """
+
+        def __init__(self, transport=None, protocol=None, reader=None,
+                     loop=None):
+            if protocol is None:
+                protocol = VoidProtocol()
+            if transport is None:
+                transport = VoidTransport(protocol=protocol)
+            self._transport = transport
+            self._protocol = protocol
+            self._reader = reader
+            self._loop = loop
+
+        def __del__(self):
+            pass
+
+        def write(self, data):
+            check(data)
+
+        def writelines(self, data):
+            for item in data:
+                check(item)
+
+        def write_eof(self):
+            pass
+
+        def can_write_eof(self):
+            return True
+
+        def drain(self):
+            return _finished(get_running_loop())
+
+        def wait_closed(self):
+            return _finished(get_running_loop())
+
+        async def start_tls(self, sslcontext, *, server_hostname=None,
+                            ssl_handshake_timeout=None,
+                            ssl_shutdown_timeout=None):
+            pass
+
+    _streams = {
+        'VoidTransport': VoidTransport,
+        'VoidProtocol': VoidProtocol,
+        'VoidStreamReader': VoidStreamReader,
+        'VoidStreamWriter': VoidStreamWriter,
+    }
+    for name, cls in _streams.items():
+        cls.__module__ = __name__
+        cls.__qualname__ = name
+    globals().update(_streams)
+    return _streams
+
+
+for _name in ('VoidTransport', 'VoidProtocol', 'VoidStreamReader',
+              'VoidStreamWriter'):
+    _lazy_attributes[_name] = lambda _name=_name: _build_streams()[_name]
+del _name
+
+
+async def open_connection(host=None, port=None, **kwds):
+    """asyncio.open_connection() lookalike returning a null reader and writer
+
+    Nothing is resolved or connected: the reader is at EOF and the writer
+    discards what it is given.
+    """
+    streams = _build_streams()
+    reader = streams['VoidStreamReader']()
+    return reader, streams['VoidStreamWriter'](reader=reader)
+
+
+# null logging
+
+def _build_logger():
+    import logging
+
+    def discard(self, *args, **kwds):
+        pass
+
+    class VoidLogger(logging.Logger):
+        """logging.Logger that is enabled for nothing
+
+        Every logging method is a plain no-op, so a call costs one method
+        lookup: no level check, no LogRecord and no handler is involved.
+        isEnabledFor() is False for every level, and makeRecord() returns
+        Void rather than building a record. Handlers, filters and levels can
+        still be set, they are simply never consulted.
+        """
+
+        debug = info = warning = warn = error = exception = critical = \
+            fatal = log = _log = handle = callHandlers = discard
+
+        def isEnabledFor(self, level):
+            return False
+
+        def getEffectiveLevel(self):
+            return sys.maxsize
+
+        def makeRecord(self, *args, **kwds):
+            return Void
+
+        def __repr__(self):
+            return '<VoidLogger {0}>'.format(self.name)
+
+    VoidLogger.__module__ = __name__
+    VoidLogger.__qualname__ = 'VoidLogger'
+    return VoidLogger
+
+
+_lazy_attributes['VoidLogger'] = _build_logger
+
+
+def void_logger(logger):
+    """Turn an existing logger into a VoidLogger in place and return it
+
+    Code that already holds the logger, and later logging.getLogger() calls
+    for its name, all get the null behavior without being changed. Accepts a
+    logger or a logger name; restore_logger() undoes it.
+    """
+    import logging
+
+    if isinstance(logger, str):
+        logger = logging.getLogger(logger)
+    cls = globals().get('VoidLogger') or __getattr__('VoidLogger')
+    if type(logger) is not cls:
+        logger.__dict__['_void_logger_class'] = type(logger)
+        logger.__class__ = cls
+    return logger
+
+
+def restore_logger(logger):
+    """Undo void_logger(), giving the logger back its original class"""
+    import logging
+
+    if isinstance(logger, str):
+        logger = logging.getLogger(logger)
+    original = logger.__dict__.pop('_void_logger_class', None)
+    if original is not None:
+        logger.__class__ = original
+    return logger
+
+
+# backends disabled for some requests only, through contextvars
+
+_registry = None
+
+
+def _build_registry():
+    global _registry
+    if _registry is not None:
+        return _registry
+    import contextvars
+
+    backends = {}
+    disabled_names = contextvars.ContextVar('void_disabled',
+                                            default=frozenset())
+    current = disabled_names.get
+    # tokens of the with blocks entered in each context, innermost last, so
+    # one disabled() can be shared by overlapping threads and tasks
+    entered = contextvars.ContextVar('void_disabled_tokens', default=())
+
+    def register_backend(name, backend):
+        """Make backend what get_backend(name) returns, where enabled"""
+        backends[name] = backend
+        return backend
+
+    def get_backend(name):
+        """The backend registered as name, or Void where name is disabled
+
+        One context variable read and two hash lookups, without locking.
+        """
+        disabled = current()
+        if disabled and name in disabled:
+            return Void
+        return backends[name]
+
+    class disabled(object):
+        """Disable the named backends in the current context only
+
+        Inside `with disabled('db'):` or `async with disabled('db'):`,
+        get_backend('db') is Void for this thread or task and for tasks it
+        starts, while every other thread and task still gets the backend.
+        One instance may be entered by any number of threads and tasks at
+        once.
+        """
+
+        __slots__ = ('names',)
+
+        def __init__(self, *names):
+            self.names = frozenset(names)
+
+        def __enter__(self):
+            token = disabled_names.set(current() | self.names)
+            entered.set(entered.get() + (token,))
+
+        def __exit__(self, etype, e, trace):
+            tokens = entered.get()
+            entered.set(tokens[:-1])
+            disabled_names.reset(tokens[-1])
+
+        async def __aenter__(self):
+            self.__enter__()
+
+        async def __aexit__(self, etype, e, trace):
+            self.__exit__(etype, e, trace)
+
+    for func in (register_backend, get_backend, disabled):
+        func.__module__ = __name__
+        func.__qualname__ = func.__name__
+    _registry = {
+        'register_backend': register_backend,
+        'get_backend': get_backend,
+        'disabled': disabled,
+    }
+    globals().update(_registry)
+    return _registry
+
+
+for _name in ('register_backend', 'get_backend', 'disabled'):
+    _lazy_attributes[_name] = lambda _name=_name: _build_registry()[_name]
+del _name